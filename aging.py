@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+import engine
+
+
+SIDES = ('ลูกหนี้', 'เจ้าหนี้')
+# ขอบบนของช่วงจำนวนวันที่เลยกำหนด (รวมขอบ) ; เกินขอบสุดท้ายเป็นช่วง >90
+EDGES = (0, 30, 60, 90)
+BUCKETS = ['ยังไม่ถึงกำหนด', '1-30', '31-60', '61-90', '>90']
+
+
+def open_items(df, as_of):
+    """แถวที่ยังค้างรับ/ค้างจ่าย ณ as_of: วางบิลแล้ว (หรือไม่มีวันวางบิล) วันที่จ่ายจริงหลัง as_of หรือว่าง และมีวันครบกำหนด"""
+    as_of = pd.Timestamp(as_of)
+    billed = df['วันวางบิล']
+    paid = df['วันที่จ่ายจริง']
+    mask = (
+        df['วันที่จะได้รับ/จ่าย'].notna()
+        & (billed.isna() | (billed <= as_of))
+        & (paid.isna() | (paid > as_of))
+        & df['ประเภท'].isin(SIDES)
+    )
+    return df.loc[mask, ['ประเภท', 'ชื่อ', 'วันที่จะได้รับ/จ่าย', 'จำนวนเงิน']]
+
+
+def bucket_of(days_past):
+    """เลขช่วงของ BUCKETS ต่อจำนวนวันที่เลยกำหนด (<= 0 คือยังไม่ถึงกำหนด)"""
+    return np.searchsorted(np.asarray(EDGES), days_past, side='left')
+
+
+def aging_table(df, as_of):
+    """ยอดค้างต่อคู่ค้าแยกตามจำนวนวันที่เลยวันที่จะได้รับ/จ่าย ณ as_of
+
+    ช่วงของแต่ละแถวได้จาก searchsorted บนจำนวนวัน แล้วรวมต่อ (ประเภท, ชื่อ, ช่วง) ด้วย bincount ครั้งเดียว
+    คืน DataFrame index = (ประเภท, ชื่อ), คอลัมน์ BUCKETS และ รวม ; แถวที่ไม่มีชื่อไม่นับ เหมือนตารางคู่ค้าอื่น
+    """
+    items = open_items(df, as_of)
+    codes, names = engine._by_name(items)
+    known = codes >= 0
+
+    due = items['วันที่จะได้รับ/จ่าย'].to_numpy().astype('datetime64[D]')
+    days_past = (np.datetime64(pd.Timestamp(as_of), 'D') - due).astype(np.int64)
+    side = (items['ประเภท'] == SIDES[1]).to_numpy().astype(np.int64)
+    amounts = np.nan_to_num(items['จำนวนเงิน'].to_numpy(dtype=float))
+
+    n_groups = len(SIDES) * len(names)
+    group = (side * len(names) + codes)[known]
+    cell = group * len(BUCKETS) + bucket_of(days_past[known])
+    sums = np.bincount(cell, weights=amounts[known], minlength=n_groups * len(BUCKETS))
+    rows = np.bincount(group, minlength=n_groups) > 0
+
+    index = pd.MultiIndex.from_product([list(SIDES), names], names=['ประเภท', 'ชื่อ'])
+    table = pd.DataFrame(sums.reshape(n_groups, len(BUCKETS)), index=index, columns=BUCKETS)[rows]
+    table['รวม'] = table[BUCKETS].sum(axis=1)
+    return table
+
+
+def totals(table):
+    """ยอดรวมต่อประเภท (ลูกหนี้ / เจ้าหนี้) ของ aging_table()"""
+    return table.groupby(level='ประเภท', sort=False).sum()
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+import engine
+import store
+
+
+class _Prefix:
+    """ผลรวมสะสมของคอลัมน์ต่อกลุ่ม เรียงตาม (กลุ่ม, วันที่) ; ถามยอดของทุกกลุ่ม ณ วันใดก็ได้ด้วย searchsorted"""
+
+    def __init__(self, groups, days, values, n_groups):
+        frame = values.groupby([groups, days]).sum()
+        group = frame.index.get_level_values(0).to_numpy()
+        day = frame.index.get_level_values(1).to_numpy()
+
+        self.columns = values.columns
+        self.first = day.min() if len(day) else 0
+        self.span = int(day.max() - self.first + 2) if len(day) else 2
+        self.keys = group * self.span + (day - self.first)
+        self.starts = np.searchsorted(group, np.arange(n_groups))
+        self.cum = np.vstack([np.zeros(len(self.columns)), frame.to_numpy().cumsum(axis=0)])
+
+    def at(self, day):
+        """ยอดของแต่ละกลุ่มจากแถวที่วันที่ <= day (แถวต่อกลุ่ม)"""
+        offset = int(np.clip(day - self.first, -1, self.span - 2))
+        ends = np.searchsorted(self.keys, np.arange(len(self.starts)) * self.span + offset, side='right')
+        return pd.DataFrame(self.cum[ends] - self.cum[self.starts], columns=self.columns)
+
+
+class AsOfIndex:
+    """ดัชนีของ ledger สำหรับดูข้อมูล ณ วันที่ใดก็ได้ (as-of) โดยไม่กรองทั้ง ledger ใหม่
+
+    - ผลรวมสะสมต่อคู่ค้าแยกลูกหนี้/เจ้าหนี้ เรียงตามวันที่จ่ายจริง: สถิติ ณ วันใด = ต่างของผลรวมสะสม
+    - ยอดรายวันสำหรับกระแสเงินสดไม่ขึ้นกับวันที่ เก็บครั้งเดียว
+    - เจ้าหนี้เรียงตามวันครบกำหนด: จุดเริ่มของแผนเลื่อนชำระหาได้ด้วย searchsorted
+    """
+
+    def __init__(self, df):
+        self.df = df
+        paid = df['วันที่จ่ายจริง']
+        known = paid.notna().to_numpy()
+        codes, names = engine._by_name(df)
+        # ชื่อว่างเป็นกลุ่มสุดท้าย (NaN) ให้ยอดรวมของ ar_ap_days ครบ
+        self.names = names.astype(object).append(pd.Index([np.nan], dtype=object))
+        codes = np.where(codes >= 0, codes, len(names))
+        days = paid.to_numpy().astype('datetime64[D]').view(np.int64)
+
+        rows = store.party_rows(df)
+        self.sides = {}
+        for side, columns in (('ลูกหนี้', store.AR_SUMS), ('เจ้าหนี้', store.AP_SUMS)):
+            mask = known & (df['ประเภท'] == side).to_numpy()
+            values = rows.loc[mask, columns].reset_index(drop=True)
+            self.sides[side] = _Prefix(codes[mask], days[mask], values, len(self.names))
+
+        self.daily, self.debtor_daily = store.daily_sums(df)
+
+        due = df['วันที่จะได้รับ/จ่าย']
+        payable = ((df['จำนวนเงิน'] < 0) & due.notna()).to_numpy()
+        positions = np.flatnonzero(payable)
+        order = np.argsort(due.to_numpy()[payable], kind='stable')
+        self._payables = positions[order]
+        self._due = due.to_numpy()[payable][order]
+
+    def party(self, as_of):
+        """store.party_sums(engine.filter_actual(df, as_of))"""
+        day = np.datetime64(pd.Timestamp(as_of), 'D').view(np.int64)
+        sums = pd.concat([self.sides[side].at(day) for side in self.sides], axis=1)
+        sums.index = self.names.rename('ชื่อ')
+        return sums[(sums[store.PARTY_COUNTS].round() > 0).any(axis=1)]
+
+    def stats(self, as_of):
+        """store.LedgerStats ณ วัน as_of ; debtor_table / creditor_table / ar_ap_days / daily_flows ได้จากตัวนี้"""
+        return store.LedgerStats(self.party(as_of), self.daily, self.debtor_daily, as_of)
+
+    def payables(self, today):
+        """แถวเจ้าหนี้ที่ครบกำหนดตั้งแต่ today (ลำดับแถวเดิม) ใช้แทน df ใน engine.plan_deferrals()"""
+        start = np.searchsorted(self._due, np.datetime64(pd.Timestamp(today)), side='left')
+        return self.df.iloc[np.sort(self._payables[start:])]
@@ -0,0 +1,139 @@
+import argparse
+import glob
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+import cache
+import engine
+import pipeline
+import scheduler
+import shortfall
+
+
+FORMATS = ('parquet', 'csv', 'xlsx')
+TABLES = ('party_stats', 'risk_table', 'daily', 'plan', 'compare', 'shortfalls')
+
+
+def find_ledgers(sources):
+    """ไดเรกทอรี (หา *.xlsx ข้างใน) หรือ glob หรือไฟล์"""
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths += sorted(Path(source).glob('*.xlsx'))
+        else:
+            paths += [Path(p) for p in sorted(glob.glob(source))]
+    # ไฟล์ล็อกของ Excel (~$...) ไม่ใช่ ledger
+    return [p for p in dict.fromkeys(paths) if not p.name.startswith('~$')]
+
+
+def _portable(df):
+    """category / interval เป็นข้อความ ให้เขียนได้ทุก format ; ค่าว่างเป็น None (null) ไม่ใช่ 'nan'"""
+    df = df.copy(deep=False)
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, (pd.CategoricalDtype, pd.IntervalDtype)):
+            df[col] = values.astype(str).astype(object).where(values.notna(), None)
+    return df
+
+
+def write_tables(tables, out_dir, stem, fmt):
+    if fmt == 'xlsx':
+        with pd.ExcelWriter(out_dir / f"{stem}.xlsx") as writer:
+            for name, df in tables.items():
+                _portable(df).to_excel(writer, sheet_name=name)
+        return
+    target = out_dir / stem
+    target.mkdir(parents=True, exist_ok=True)
+    for name, df in tables.items():
+        df = _portable(df)
+        if fmt == 'parquet':
+            df.to_parquet(target / f"{name}.parquet")
+        else:
+            df.to_csv(target / f"{name}.csv", encoding='utf-8-sig')
+
+
+def summarize(path, report, today, threshold):
+    days = report['ar_ap_days']
+    future = report['daily'].loc[report['daily'].index >= today, 'เงินสดสะสม']
+    after = report['compare']['หลังเลื่อน']
+    return {
+        'file': str(path),
+        **days,
+        'counterparties': len(report['party_stats']),
+        'high_risk_debtors': int((report['risk_table']['grade'] == engine.GRADES[-1]).sum()),
+        'min_balance': future.min() if len(future) else None,
+        'days_below_threshold': int((future < threshold).sum()),
+        'deferred_count': len(report['plan']),
+        'deferred_amount': report['plan']['จำนวนเงินที่เลื่อน'].sum(),
+        'days_below_threshold_after': int((after < threshold).sum()),
+        'shortfall_runs': len(report['shortfalls']),
+        'max_shortfall': report['shortfalls']['ขาด'].max() if len(report['shortfalls']) else 0.0,
+        'shortfall_runs_after': len(shortfall.runs(after.to_numpy() < threshold)[0]),
+        'error': None,
+    }
+
+
+def analyze_file(path, out_dir, fmt, today, cash_accum, threshold, mode, use_cache):
+    """ทำงานใน worker: อ่าน วิเคราะห์ เขียนผล แล้วคืนแถวสรุป"""
+    try:
+        df = cache.load(path) if use_cache else engine.load(path)
+        report = pipeline.Pipeline(df).report(today, cash_accum, threshold, mode)
+        write_tables({name: report[name] for name in TABLES}, out_dir, Path(path).stem, fmt)
+        return summarize(path, report, today, threshold)
+    except Exception as e:
+        return {'file': str(path), 'error': f"{type(e).__name__}: {e}", 'traceback': traceback.format_exc()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='วิเคราะห์ ledger หลายไฟล์พร้อมกันแบบเดียวกับ t5.py')
+    parser.add_argument('sources', nargs='+', help='ไดเรกทอรี, glob หรือไฟล์ .xlsx')
+    parser.add_argument('--out', default='batch_output')
+    parser.add_argument('--format', choices=FORMATS, default='parquet')
+    parser.add_argument('--threshold', type=float, default=0.0)
+    parser.add_argument('--cash-accum', type=float, default=0.0, help='เงินสดยกมา')
+    parser.add_argument('--mode', choices=('static', 'balanced', *scheduler.MODES), default='static')
+    parser.add_argument('--as-of', type=pd.Timestamp, default=None, help='วันที่แยกข้อมูลจริง/คาดการณ์ (ค่าเริ่มต้น วันนี้)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args(argv)
+
+    paths = find_ledgers(args.sources)
+    if not paths:
+        parser.error('ไม่พบไฟล์ .xlsx')
+
+    today = (args.as_of or pd.Timestamp.today()).normalize()
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    rows = []
+    # หนึ่ง worker ต่อหนึ่งไฟล์แล้วจบโปรเซส หน่วยความจำจึงไม่สะสมข้ามไฟล์
+    with ProcessPoolExecutor(max_workers=min(args.workers, len(paths)), max_tasks_per_child=1) as pool:
+        futures = [
+            pool.submit(analyze_file, path, out_dir, args.format, today,
+                        args.cash_accum, args.threshold, args.mode, not args.no_cache)
+            for path in paths
+        ]
+        for future in as_completed(futures):
+            row = future.result()
+            status = 'ผิดพลาด: ' + row['error'] if row['error'] else 'เสร็จ'
+            print(f"{row['file']}: {status}", file=sys.stderr)
+            rows.append(row)
+
+    summary = pd.DataFrame(rows).drop(columns='traceback', errors='ignore').sort_values('file').set_index('file')
+    summary = _portable(summary)
+    if args.format == 'parquet':
+        summary.to_parquet(out_dir / 'summary.parquet')
+    elif args.format == 'csv':
+        summary.to_csv(out_dir / 'summary.csv', encoding='utf-8-sig')
+    else:
+        summary.to_excel(out_dir / 'summary.xlsx', sheet_name='summary')
+    return 1 if summary['error'].notna().any() else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
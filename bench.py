@@ -0,0 +1,141 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import dates
+import engine
+import synth
+
+
+DEFAULT_OUT = 'bench_baseline.json'
+
+
+def measure(fn, repeat=1):
+    """เวลาที่ดีที่สุดจาก repeat รอบ (ไม่เปิด tracemalloc) และหน่วยความจำสูงสุดจากอีกหนึ่งรอบ"""
+    seconds = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        seconds.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, min(seconds), peak / 2**20
+
+
+def stages(raw, today, with_load, tmpdir):
+    """ลำดับขั้นตอนเหมือน t5.py: (ชื่อ, ฟังก์ชัน) ขั้นหลังใช้ผลของขั้นก่อน"""
+    state = {}
+
+    if with_load:
+        path = synth.write_workbook(raw, Path(tmpdir) / 'ledger.xlsx')
+        yield 'load', lambda: engine.read_excel(path)
+
+    as_text = {col: raw[col].dt.strftime('%Y-%m-%d').astype(object) for col in engine.DATE_COLS}
+    yield 'parse_dates', lambda: [dates.parse_dates(s) for s in as_text.values()]
+
+    def prepare():
+        state['df'] = engine.prepare(raw)
+        state['filtered'] = engine.filter_actual(state['df'], today)
+        return state['df']
+    yield 'prepare', prepare
+
+    yield 'ar_ap_days', lambda: engine.ar_ap_days(state['filtered'])
+
+    def late_pct():
+        state['late_pct'] = engine.debtor_stats(state['filtered'])[2]
+        return state['late_pct']
+    yield 'late_pct', late_pct
+
+    def daily_cashflow():
+        state['df_merged'] = engine.daily_cashflow(state['df'], state['late_pct'], 0.0, today)
+        future = state['df_merged'].loc[state['df_merged'].index >= today, 'เงินสดสะสม']
+        state['threshold'] = float(future.quantile(0.5)) if len(future) else 0.0
+        return state['df_merged']
+    yield 'daily_cashflow', daily_cashflow
+
+    for mode in ('static', 'balanced'):
+        yield f'plan_{mode}', lambda mode=mode: engine.plan_deferrals(
+            state['df'], state['df_merged'], state['threshold'], today, mode
+        )
+
+
+def run(sizes, seed=0, repeat=1, with_load=False):
+    results = []
+    today = synth.as_of()
+    for size in sizes:
+        n = synth.SIZES[size]
+        raw = synth.generate(n, seed=seed)
+        load = with_load and n <= synth.EXCEL_MAX_ROWS
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for stage, fn in stages(raw, today, load, tmpdir):
+                _, seconds, peak_mb = measure(fn, repeat)
+                results.append({'size': size, 'rows': n, 'stage': stage, 'seconds': seconds, 'peak_mb': peak_mb})
+                print(f"{size:>5} {stage:<16} {seconds:9.4f}s {peak_mb:10.1f} MB", file=sys.stderr)
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'created': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.platform(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """ขั้นที่ช้าลงเกิน tolerance เท่าเมื่อเทียบกับ baseline"""
+    old = {(r['size'], r['stage']): r for r in baseline['results']}
+    regressions = []
+    for r in results:
+        prev = old.get((r['size'], r['stage']))
+        if prev and prev['seconds'] > 0 and r['seconds'] / prev['seconds'] > tolerance:
+            regressions.append({**r, 'baseline_seconds': prev['seconds'], 'ratio': r['seconds'] / prev['seconds']})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='วัดเวลา/หน่วยความจำของแต่ละขั้นตอนกับ ledger สังเคราะห์')
+    parser.add_argument('--sizes', nargs='+', choices=list(synth.SIZES), default=['1k', '100k'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--with-load', action='store_true', help='เขียนเป็น .xlsx แล้ววัดการอ่านด้วย (ช้า)')
+    parser.add_argument('--out', default=DEFAULT_OUT)
+    parser.add_argument('--compare', help='baseline JSON เดิม')
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.seed, args.repeat, args.with_load)
+    Path(args.out).write_text(json.dumps({'meta': metadata(), 'results': results}, indent=2, ensure_ascii=False))
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = compare(results, baseline, args.tolerance)
+        for r in regressions:
+            print(f"ช้าลง: {r['size']} {r['stage']} {r['baseline_seconds']:.4f}s → {r['seconds']:.4f}s (x{r['ratio']:.2f})")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import hashlib
+import io
+import os
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import engine
+
+
+# เปลี่ยนเมื่อรูปแบบข้อมูลที่ engine.prepare() คืนค่าเปลี่ยน เพื่อไม่ให้อ่าน cache เก่า
+CACHE_VERSION = 3
+
+DEFAULT_DIR = Path(os.environ.get('CASHFLOW_CACHE_DIR', Path.home() / '.cache' / 'cashflow-management'))
+DEFAULT_MAX_BYTES = int(float(os.environ.get('CASHFLOW_CACHE_MAX_MB', 1024)) * 1024 * 1024)
+
+
+def file_key(data):
+    """SHA-256 ของเนื้อไฟล์ (bytes)"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class FrameCache:
+    """เก็บ DataFrame ที่เตรียมแล้วเป็น Parquet บนดิสก์ ลบไฟล์ที่ใช้ล่าสุดนานที่สุดออกเมื่อเกิน max_bytes"""
+
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key):
+        return self.directory / f"{key}-v{CACHE_VERSION}.parquet"
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            table = pq.read_table(path, memory_map=True)
+        except (FileNotFoundError, pa.ArrowException):
+            return None
+        os.utime(path)
+        return table.to_pandas()
+
+    def put(self, key, df):
+        path = self.path(key)
+        tmp = path.with_suffix('.tmp')
+        try:
+            df.to_parquet(tmp, index=False)
+        except (pa.ArrowException, TypeError, ValueError):
+            # คอลัมน์อื่นในไฟล์ที่ชนิดข้อมูลปนกันแปลงเป็น Arrow ไม่ได้ ก็ไม่ต้อง cache
+            tmp.unlink(missing_ok=True)
+            return False
+        os.replace(tmp, path)
+        self.evict()
+        return True
+
+    def evict(self):
+        files = sorted(self.directory.glob('*.parquet'), key=lambda p: p.stat().st_mtime, reverse=True)
+        # ไฟล์ล่าสุดเก็บไว้เสมอ แม้ใหญ่กว่า max_bytes
+        total = files[0].stat().st_size if files else 0
+        for path in files[1:]:
+            total += path.stat().st_size
+            if total > self.max_bytes:
+                path.unlink(missing_ok=True)
+
+    def clear(self):
+        for path in self.directory.glob('*.parquet'):
+            path.unlink(missing_ok=True)
+
+
+def load(file, cache=None):
+    """engine.load() ผ่าน cache: file เป็น path หรือ bytes"""
+    data = file if isinstance(file, bytes) else Path(file).read_bytes()
+    cache = FrameCache() if cache is None else cache
+
+    key = file_key(data)
+    df = cache.get(key)
+    if df is None:
+        df = engine.load(io.BytesIO(data))
+        cache.put(key, df)
+    return df
@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+
+POINT_BUDGET = 800
+BAR_BUDGET = 200
+
+
+def minmax_indices(y, n_buckets):
+    """ตำแหน่งค่าต่ำสุดและสูงสุดของแต่ละช่วง (ไม่ซ่อนจุดต่ำสุดของเงินสด) เรียงตามเวลา"""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, n_buckets + 1).astype(int)
+    bucket = np.repeat(np.arange(n_buckets), np.diff(edges))
+    # NaN ไม่ถูกเลือกเป็น min/max ยกเว้นทั้งช่วงเป็น NaN
+    lo = np.where(np.isnan(y), np.inf, y)
+    hi = np.where(np.isnan(y), -np.inf, y)
+
+    order_lo = np.lexsort((lo, bucket))
+    order_hi = np.lexsort((-hi, bucket))
+    first = edges[:-1]
+    idx = np.concatenate([order_lo[first], order_hi[first], [0, n - 1]])
+    return np.unique(idx)
+
+
+def lttb_indices(y, n_out):
+    """Largest-Triangle-Three-Buckets บนแกน x เป็นลำดับวัน"""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    picked = [0]
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = edges[i + 1], (edges[i + 2] if i + 2 < len(edges) else n)
+        ax, ay = picked[-1], y[picked[-1]]
+        cx, cy = (nxt_lo + nxt_hi - 1) / 2, np.nanmean(y[nxt_lo:nxt_hi])
+        xs = np.arange(lo, hi)
+        area = np.abs((ax - cx) * (y[lo:hi] - ay) - (ax - xs) * (cy - ay))
+        picked.append(lo + int(np.nanargmax(area)) if not np.isnan(area).all() else lo)
+    picked.append(n - 1)
+    return np.asarray(picked)
+
+
+def downsample(series, budget=POINT_BUDGET, method='minmax'):
+    """ย่อ series (index = วันที่) ให้เหลือราว budget จุด แยกทำเฉพาะช่วงที่ไม่ใช่ NaN"""
+    s = series.dropna()
+    if len(s) <= budget:
+        return s
+    if method == 'lttb':
+        idx = lttb_indices(s.to_numpy(), budget)
+    else:
+        idx = minmax_indices(s.to_numpy(), budget // 2)
+    return s.iloc[idx]
+
+
+def bar_freq(df_merged, budget=BAR_BUDGET):
+    days = len(df_merged)
+    if days <= budget:
+        return 'D'
+    if days / 7 <= budget:
+        return 'W'
+    return 'MS'
+
+
+def risk_bars(df_merged, freq='D'):
+    """Risk % ต่อวัน/สัปดาห์/เดือน ถ่วงด้วยยอดลูกหนี้ (รวม total_riskamt / รวม total_amount)"""
+    if freq == 'D':
+        return df_merged['risk_pct']
+    grouped = df_merged[['total_riskamt', 'total_amount']].resample(freq).sum()
+    ratio = grouped['total_riskamt'] / grouped['total_amount'].where(grouped['total_amount'] != 0)
+    return (ratio * 100).round(2).fillna(0).rename('risk_pct')
+
+
+def _days(index):
+    # วันที่เป็นข้อความสั้น ๆ แทน timestamp เต็ม ลดขนาด JSON
+    return index.strftime('%Y-%m-%d')
+
+
+def cash_risk_figure(df_merged, rmin=70, rmax=100, fast=True, budget=POINT_BUDGET, method='minmax'):
+    """กราฟเงินสดสะสมเทียบ Risk % ; fast=True ใช้ Scattergl, ย่อจุด และรวมแท่งเป็นสัปดาห์/เดือนเมื่อช่วงยาว"""
+    fig = go.Figure()
+    if fast:
+        freq = bar_freq(df_merged)
+        bars = risk_bars(df_merged, freq)
+        fig.add_trace(go.Bar(x=_days(bars.index), y=bars.to_numpy(), name=f'Risk % ({freq})', yaxis='y2', opacity=0.4))
+        for col in ('สะสมจริง', 'สะสมคาดการณ์'):
+            s = downsample(df_merged[col], budget, method)
+            fig.add_trace(go.Scattergl(x=_days(s.index), y=s.round(0).to_numpy(), mode='lines', name=col))
+    else:
+        fig.add_trace(go.Bar(x=df_merged.index, y=df_merged['risk_pct'], name='Risk %', yaxis='y2', opacity=0.4))
+        fig.add_trace(go.Scatter(x=df_merged.index, y=df_merged['สะสมจริง'], mode='lines', name='สะสมจริง'))
+        fig.add_trace(go.Scatter(x=df_merged.index, y=df_merged['สะสมคาดการณ์'], mode='lines', name='สะสมคาดการณ์'))
+
+    fig.update_layout(
+        title='Cashflow Cumulative vs. Risk %',
+        xaxis=dict(title='Date', showgrid=False, zeroline=False),
+        yaxis=dict(title='Cumulative Cash', showgrid=False, zeroline=False),
+        yaxis2=dict(title='Risk %', overlaying='y', side='right', range=[rmin, rmax], showgrid=False, zeroline=False),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+def simulation_figure(bands, threshold=0.0):
+    """แถบ P5–P95 และ P50 ของเงินสดสะสมจากการจำลอง เทียบแผนเดิม พร้อมโอกาสต่ำกว่า threshold (แกนขวา)"""
+    x = _days(bands.index)
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=x, y=bands['breach_pct'].to_numpy(), name='โอกาสต่ำกว่า threshold (%)', yaxis='y2', opacity=0.3))
+    fig.add_trace(go.Scatter(x=x, y=bands['P95'].round(0).to_numpy(), mode='lines', line=dict(width=0), showlegend=False, name='P95'))
+    fig.add_trace(go.Scatter(
+        x=x, y=bands['P5'].round(0).to_numpy(), mode='lines', line=dict(width=0),
+        fill='tonexty', fillcolor='rgba(99, 110, 250, 0.2)', name='P5–P95'
+    ))
+    fig.add_trace(go.Scatter(x=x, y=bands['P50'].round(0).to_numpy(), mode='lines', name='P50'))
+    fig.add_trace(go.Scatter(x=x, y=bands['เงินสดสะสม'].round(0).to_numpy(), mode='lines', name='แผนเดิม', line=dict(dash='dot')))
+    fig.add_hline(y=threshold, line_dash='dash', line_color='red')
+
+    fig.update_layout(
+        title='Simulated Cumulative Cash (P5 / P50 / P95)',
+        xaxis=dict(title='Date', showgrid=False, zeroline=False),
+        yaxis=dict(title='Cumulative Cash', showgrid=False, zeroline=False),
+        yaxis2=dict(title='Breach %', overlaying='y', side='right', range=[0, 100], showgrid=False, zeroline=False),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+def trend_figure(table, title, y_title):
+    """เส้นแนวโน้ม (คอลัมน์ละเส้น) ย่อจุดเมื่อช่วงยาว"""
+    fig = go.Figure()
+    for col in table.columns:
+        s = downsample(table[col])
+        fig.add_trace(go.Scattergl(x=_days(s.index), y=s.round(1).to_numpy(), mode='lines', name=str(col)))
+    fig.update_layout(
+        title=title,
+        xaxis=dict(title='Date', showgrid=False, zeroline=False),
+        yaxis=dict(title=y_title, showgrid=False, zeroline=False),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+def scenario_heatmap(table, title):
+    """heatmap ของตาราง เงินสดยกมา (แถว) × threshold (คอลัมน์)"""
+    fig = go.Figure(go.Heatmap(
+        z=table.to_numpy(), x=table.columns.to_numpy(), y=table.index.to_numpy(),
+        colorscale='RdYlGn_r', colorbar=dict(title=title)
+    ))
+    fig.update_layout(
+        title=title,
+        xaxis=dict(title='Threshold', tickformat=',.0f'),
+        yaxis=dict(title='Opening Cash', tickformat=',.0f'),
+    )
+    return fig
+
+
+def cube_figure(table, key=None):
+    """ยอดรับ/จ่ายต่องวดเป็นแท่งพร้อมเงินสดสะสม (แกนขวา) ; แยกกลุ่ม (key) แสดงยอดสุทธิต่อกลุ่มเป็นแท่งซ้อน"""
+    fig = go.Figure()
+    if key is None:
+        x = _days(table.index)
+        fig.add_trace(go.Bar(x=x, y=table['กระแสเงินสดรับ'].round(0).to_numpy(), name='กระแสเงินสดรับ'))
+        fig.add_trace(go.Bar(x=x, y=table['กระแสเงินสดจ่าย'].round(0).to_numpy(), name='กระแสเงินสดจ่าย'))
+        fig.add_trace(go.Scattergl(x=x, y=table['เงินสดสะสม'].round(0).to_numpy(), mode='lines', name='เงินสดสะสม', yaxis='y2'))
+    else:
+        for label, group in table.groupby(key, sort=False):
+            fig.add_trace(go.Bar(x=_days(group.index), y=group['กระแสเงินสดสุทธิ'].round(0).to_numpy(), name=str(label)))
+
+    fig.update_layout(
+        barmode='relative',
+        xaxis=dict(title='Period', showgrid=False, zeroline=False),
+        yaxis=dict(title='Cash Flow', showgrid=False, zeroline=False),
+        yaxis2=dict(title='Cumulative Cash', overlaying='y', side='right', showgrid=False, zeroline=False),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+def shortfall_figure(df_compare, shortfalls, threshold=0.0, max_marks=50):
+    """เงินสดสะสม ก่อน–หลังเลื่อนชำระ พร้อมแถบช่วงที่ต่ำกว่า threshold (ช่วงที่ขาดมากสุด max_marks ช่วง)"""
+    fig = go.Figure()
+    for col in df_compare.columns:
+        s = downsample(df_compare[col])
+        fig.add_trace(go.Scattergl(x=_days(s.index), y=s.round(0).to_numpy(), mode='lines', name=col))
+    fig.add_hline(y=threshold, line_dash='dash', line_color='red')
+    marks = shortfalls.iloc[:0] if shortfalls.empty else shortfalls.nlargest(max_marks, 'ขาด')
+    for start, end, low_day, low, gap in zip(
+        _days(pd.DatetimeIndex(marks['เริ่ม'])), _days(pd.DatetimeIndex(marks['สิ้นสุด'])),
+        _days(pd.DatetimeIndex(marks['วันที่ต่ำสุด'])), marks['เงินสดสะสมต่ำสุด'], marks['ขาด']
+    ):
+        fig.add_vrect(x0=start, x1=end, fillcolor='red', opacity=0.1, line_width=0)
+        fig.add_annotation(x=low_day, y=low, text=f"-{gap:,.0f}", showarrow=True, arrowhead=2, font=dict(size=10))
+
+    fig.update_layout(
+        title='Cumulative Cash Before / After Deferral',
+        xaxis=dict(title='Date', showgrid=False, zeroline=False),
+        yaxis=dict(title='Cumulative Cash', showgrid=False, zeroline=False),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+import engine
+
+
+GRANULARITIES = {'D': 'รายวัน', 'W': 'รายสัปดาห์ (ISO)', 'M': 'รายเดือน'}
+PERIOD_NAMES = {'D': 'วันที่', 'W': 'สัปดาห์', 'M': 'เดือน'}
+SUMS = ['กระแสเงินสดรับ', 'กระแสเงินสดจ่าย', 'กระแสเงินสดสุทธิ', 'total_riskamt', 'total_amount']
+SIDES = ('ลูกหนี้', 'เจ้าหนี้')
+# จำนวนคู่ค้าสูงสุดที่แยกได้ (ตาราง คู่ค้า × วัน อยู่ในหน่วยความจำ)
+MAX_NAMES = 200
+
+
+class CashCube:
+    """ผลรวมสะสมรายวันของ SUMS ต่อกลุ่ม (กลุ่ม × วัน) สร้างครั้งเดียว
+
+    ยอดของสัปดาห์/เดือนใดก็ได้คือผลต่างของผลรวมสะสม ณ ขอบช่วง ไม่ต้อง groupby ledger ใหม่
+    labels = ชื่อกลุ่ม, dates = วันที่รายวันเต็มช่วง, cum = {คอลัมน์: array (กลุ่ม × วัน+1) คอลัมน์แรกเป็นศูนย์}
+    """
+
+    def __init__(self, labels, dates, daily):
+        self.labels = labels
+        self.dates = dates
+        self.cum = {name: np.pad(values.cumsum(axis=1), ((0, 0), (1, 0))) for name, values in daily.items()}
+
+    @classmethod
+    def from_flows(cls, df_flows):
+        """กลุ่มเดียว (รวม) จาก engine.daily_flows() ยอดตรงกับตารางรายวัน"""
+        daily = {name: df_flows[name].to_numpy(dtype=float)[None, :] for name in SUMS}
+        return cls(pd.Index(['รวม'], name='กลุ่ม'), df_flows.index, daily)
+
+    @classmethod
+    def from_ledger(cls, df, late_pct, dates, by='ประเภท', names=None):
+        """แยกตามประเภท หรือตามคู่ค้าใน names (ไม่เกิน MAX_NAMES) ; ยอดต่อวันลงตารางด้วย bincount ครั้งเดียวต่อคอลัมน์"""
+        if by == 'ชื่อ':
+            if names is None or len(names) > MAX_NAMES:
+                raise ValueError(f"เลือกคู่ค้าได้ไม่เกิน {MAX_NAMES} ราย")
+            labels = pd.Index(list(names), name='ชื่อ')
+            codes = labels.get_indexer(df['ชื่อ'].astype(object))
+        elif by == 'ประเภท':
+            labels = pd.Index(list(SIDES), name='ประเภท')
+            codes = labels.get_indexer(df['ประเภท'])
+        else:
+            raise ValueError(f"unknown split: {by}")
+
+        n_days = len(dates)
+        day = np.full(len(df), -1, dtype=np.int64)
+        paid = df['วันที่จ่ายจริง'].notna().to_numpy()
+        if n_days:
+            first = np.datetime64(dates[0], 'D')
+            day[paid] = (df['วันที่จ่ายจริง'].to_numpy()[paid].astype('datetime64[D]') - first).astype(np.int64)
+        keep = (codes >= 0) & (day >= 0) & (day < n_days)
+        cell = codes[keep] * n_days + day[keep]
+
+        amount = np.nan_to_num(df['จำนวนเงิน'].to_numpy(dtype=float))
+        debtor = (df['ประเภท'] == 'ลูกหนี้').to_numpy()
+        risk = np.nan_to_num(engine._lookup(df['ชื่อ'], late_pct['% จ่ายเกินเวลา']) / 100) * amount
+        values = {
+            'กระแสเงินสดรับ': np.where(amount > 0, amount, 0.0),
+            'กระแสเงินสดจ่าย': np.where(amount < 0, amount, 0.0),
+            'กระแสเงินสดสุทธิ': amount,
+            'total_riskamt': np.where(debtor, risk, 0.0),
+            'total_amount': np.where(debtor, amount, 0.0),
+        }
+        daily = {
+            name: np.bincount(cell, weights=v[keep], minlength=len(labels) * n_days).reshape(len(labels), n_days)
+            for name, v in values.items()
+        }
+        return cls(labels, dates, daily)
+
+    def rollup(self, granularity='D', start=None, opening=0.0):
+        """ยอดต่องวด (วัน / สัปดาห์ ISO เริ่มวันจันทร์ / เดือน) ตั้งแต่ start ของทุกกลุ่ม
+
+        เงินสดสะสม = opening + ยอดสุทธิสะสมถึงวันสุดท้ายของงวด ; risk_pct ถ่วงด้วยยอดลูกหนี้ของงวด
+        คืนตาราง index = งวด (วันแรกของงวด) และคอลัมน์กลุ่มเมื่อมีมากกว่าหนึ่งกลุ่ม
+        """
+        first = 0 if start is None else int(self.dates.searchsorted(pd.Timestamp(start)))
+        starts, labels = _periods(self.dates[first:], granularity)
+        starts = starts + first
+        # ไม่มีงวด (start หลังวันสุดท้าย) ได้ตารางว่างที่คอลัมน์ครบ
+        ends = np.append(starts[1:], len(self.dates))[:len(starts)]
+
+        n_groups, n_periods = len(self.labels), len(starts)
+        frame = pd.DataFrame({name: (c[:, ends] - c[:, starts]).ravel() for name, c in self.cum.items()})
+        frame.insert(3, 'เงินสดสะสม', self.cum['กระแสเงินสดสุทธิ'][:, ends].ravel() + opening)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratio = frame['total_riskamt'] / frame['total_amount'].where(frame['total_amount'] != 0)
+        frame['risk_pct'] = (ratio * 100).round(2).fillna(0)
+        frame.index = pd.DatetimeIndex(np.tile(labels, n_groups), name=PERIOD_NAMES[granularity])
+        if n_groups > 1:
+            frame.insert(0, self.labels.name, np.repeat(self.labels.to_numpy(), n_periods))
+        return frame.drop(columns='total_amount')
+
+
+def _periods(dates, granularity):
+    """ตำแหน่งวันแรกของแต่ละงวดใน dates และวันที่ที่ใช้เป็นชื่องวด"""
+    days = dates.to_numpy().astype('datetime64[D]')
+    if granularity == 'D':
+        return np.arange(len(days)), days
+    if granularity == 'W':
+        # 1970-01-01 เป็นวันพฤหัส ; +3 ให้งวดเปลี่ยนทุกวันจันทร์
+        key = (days.view(np.int64) + 3) // 7
+        label = (key * 7 - 3).astype('datetime64[D]')
+    elif granularity == 'M':
+        key = days.astype('datetime64[M]').view(np.int64)
+        label = key.astype('datetime64[M]').astype('datetime64[D]')
+    else:
+        raise ValueError(f"unknown granularity: {granularity}")
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]]) if len(key) else np.arange(0)
+    return starts, label[starts]
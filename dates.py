@@ -0,0 +1,64 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# รูปแบบที่ให้ผลเหมือน format='mixed' (dateutil, dayfirst=False) ทุกค่าที่แปลงผ่าน
+FAST_FORMATS = ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%m/%d/%Y', '%m/%d/%Y %H:%M:%S']
+SAMPLE_SIZE = 64
+
+_BE_YEAR = re.compile(r'(?<!\d)(2[4-9]\d\d)(?!\d)')
+
+
+def dominant_format(strings):
+    """รูปแบบใน FAST_FORMATS ที่แปลงตัวอย่างได้มากที่สุด, None ถ้าไม่มีเลย"""
+    sample = pd.Series(strings[:SAMPLE_SIZE], dtype=object)
+    best, best_count = None, 0
+    for fmt in FAST_FORMATS:
+        count = pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum()
+        if count > best_count:
+            best, best_count = fmt, count
+    return best
+
+
+def _from_buddhist_era(s):
+    return _BE_YEAR.sub(lambda m: str(int(m.group(1)) - 543), s)
+
+
+def _parse_unique(uniques, buddhist_era):
+    uniques = pd.Series(uniques, dtype=object)
+    is_str = uniques.map(lambda v: isinstance(v, str))
+    if buddhist_era:
+        uniques[is_str] = uniques[is_str].map(_from_buddhist_era)
+
+    parts = []
+    todo = uniques
+    fmt = dominant_format(uniques[is_str].to_numpy()) if is_str.any() else None
+    if fmt is not None:
+        fast = pd.to_datetime(uniques[is_str], format=fmt, errors='coerce').dropna()
+        parts.append(fast)
+        todo = uniques.drop(fast.index)
+    if len(todo):
+        parts.append(pd.to_datetime(todo, format='mixed'))
+
+    if not parts:
+        return pd.Series([], dtype='datetime64[ns]')
+    return pd.concat(parts).reindex(uniques.index)
+
+
+def parse_dates(values, buddhist_era=False):
+    """เหมือน pd.to_datetime(values, format='mixed') แต่แปลงแต่ละค่าที่ไม่ซ้ำเพียงครั้งเดียว
+
+    buddhist_era=True จะแปลงปี พ.ศ. (2400 ขึ้นไป) ในข้อความเป็น ค.ศ. ก่อน
+    """
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        return pd.to_datetime(s)
+
+    codes, uniques = pd.factorize(s.to_numpy(dtype=object))
+    parsed = _parse_unique(np.asarray(uniques, dtype=object), buddhist_era)
+
+    # เพิ่ม NaT ไว้ท้ายให้ code -1 (ค่าว่าง) ชี้ไป
+    table = np.append(parsed.to_numpy(), np.array(['NaT'], dtype=parsed.dtype))
+    return pd.Series(table[codes], index=s.index, name=s.name)
@@ -0,0 +1,123 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+
+
+ENV_FLAG = 'CASHFLOW_DIAGNOSTICS'
+ENV_LOG = 'CASHFLOW_DIAGNOSTICS_LOG'
+# จำนวน record สูงสุดที่ Recorder เก็บ (รวมจากการรันก่อนหน้า)
+MAX_RECORDS = 500
+
+
+def enabled_by_env():
+    return os.environ.get(ENV_FLAG, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def _status_mb(field):
+    """ค่าหน่วยความจำจาก /proc/self/status (Linux) เป็น MB, None ถ้าอ่านไม่ได้"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    return None
+
+
+def rss_mb():
+    """RSS ปัจจุบันของโปรเซส (MB), None ถ้าวัดไม่ได้"""
+    return _status_mb('VmRSS')
+
+
+def peak_rss_mb():
+    """RSS สูงสุดตั้งแต่ reset_peak_rss() ครั้งล่าสุด (หรือตั้งแต่เริ่มโปรเซส) เป็น MB, None ถ้าวัดไม่ได้"""
+    return _status_mb('VmHWM')
+
+
+def reset_peak_rss():
+    """เริ่มนับ RSS สูงสุดใหม่ (Linux: เขียน 5 ลง /proc/self/clear_refs) คืน False ถ้าทำไม่ได้
+
+    ru_maxrss เป็นค่าสูงสุดของทั้งโปรเซสและ reset ไม่ได้ จึงใช้แยกรายขั้นตอนไม่ได้
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _rows(result):
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], (pd.DataFrame, pd.Series)):
+        return len(result[0])
+    return None
+
+
+class Recorder:
+    """จับ wall time / CPU time / RSS / จำนวนแถว ของแต่ละขั้นตอน เมื่อ enabled เท่านั้น
+
+    peak_rss_mb = RSS สูงสุดระหว่างขั้นตอน (รวมขั้นตอนที่ซ้อนอยู่ข้างใน) ; rss_delta_mb = RSS หลัง - ก่อน
+    ทั้งสองเป็น None เมื่อวัดไม่ได้ (นอก Linux) ; records ส่งรายการที่เก็บไว้ข้ามการรันเข้ามาได้ (เก็บไม่เกิน MAX_RECORDS)
+    """
+
+    def __init__(self, enabled=False, log_path=None, context=None, records=None):
+        self.enabled = enabled
+        self.log_path = Path(log_path) if log_path else None
+        self.context = context or {}
+        self.records = [] if records is None else records
+        # peak ของขั้นตอนที่กำลังรัน (นอกสุดก่อน) ; None เมื่อ reset ไม่ได้
+        self._peaks = []
+
+    def run(self, stage, fn, *args, **kwargs):
+        if not self.enabled:
+            return fn(*args, **kwargs)
+
+        rss0 = rss_mb()
+        self._enter()
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+            peak = self._exit()
+        rss1 = rss_mb()
+        record = {
+            **self.context,
+            'stage': stage,
+            'wall_s': wall,
+            'cpu_s': cpu,
+            'peak_rss_mb': peak,
+            'rss_delta_mb': None if rss0 is None or rss1 is None else rss1 - rss0,
+            'rows': _rows(result),
+            'at': pd.Timestamp.now().isoformat(timespec='seconds'),
+        }
+        self.records.append(record)
+        del self.records[:-MAX_RECORDS]
+        if self.log_path is not None:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return result
+
+    def _enter(self):
+        # ขั้นตอนซ้อน: เก็บ peak ของขั้นตอนนอกก่อน reset
+        if self._peaks and self._peaks[-1] is not None:
+            self._peaks[-1] = max(self._peaks[-1], peak_rss_mb() or 0.0)
+        self._peaks.append(0.0 if reset_peak_rss() else None)
+
+    def _exit(self):
+        peak = self._peaks.pop()
+        if peak is None:
+            return None
+        peak = max(peak, peak_rss_mb() or 0.0)
+        if self._peaks and self._peaks[-1] is not None:
+            self._peaks[-1] = max(self._peaks[-1], peak)
+        return peak
+
+    def table(self):
+        return pd.DataFrame(self.records, columns=['stage', 'wall_s', 'cpu_s', 'peak_rss_mb', 'rss_delta_mb', 'rows', 'at'])
@@ -0,0 +1,425 @@
+import numpy as np
+import pandas as pd
+
+import dates
+import readers
+from segtree import MinSegmentTree
+
+
+REQUIRED_COLS = [
+    'วันที่จ่ายจริง', 'วันวางบิล', 'วันที่จะได้รับ/จ่าย',
+    'ประเภท', 'ชื่อ', 'จำนวนเงิน'
+]
+DATE_COLS = ['วันที่จ่ายจริง', 'วันวางบิล', 'วันที่จะได้รับ/จ่าย']
+HIDDEN_COLS = ['ระยะเวลา', 'ระยะเวลาที่กำหนด', 'diff']
+CATEGORY_COLS = ['ประเภท', 'ชื่อ']
+
+BINS = [-0.1, 10, 30, 50, 70, 100]
+GRADES = ['ต่ำมาก', 'ต่ำ', 'ปานกลาง', 'เสี่ยง', 'เสี่ยงสูง']
+
+PLAN_COLS = ['ชื่อเจ้าหนี้', 'วันที่เดิม', 'วันที่จ่ายใหม่', 'จำนวนเงินที่เลื่อน']
+
+
+class MissingColumnsError(ValueError):
+    def __init__(self, missing):
+        self.missing = list(missing)
+        super().__init__(f"คอลัมน์หายไป: {', '.join(self.missing)}")
+
+
+def read_excel(file, reader=readers.DEFAULT_READER):
+    """อ่านเฉพาะคอลัมน์ที่ต้องใช้ (ดู readers.py สำหรับ reader ที่เลือกได้)"""
+    return readers.read(file, reader, columns=REQUIRED_COLS)
+
+
+def missing_columns(df):
+    return [c for c in REQUIRED_COLS if c not in df.columns]
+
+
+def prepare(df):
+    """แปลงวันที่ คำนวณ ระยะเวลา / ระยะเวลาที่กำหนด / diff แล้วบีบอัดด้วย compact()"""
+    df = df.copy(deep=False)
+    for col in DATE_COLS:
+        df[col] = dates.parse_dates(df[col])
+
+    df['ระยะเวลา']         = (df['วันที่จ่ายจริง'] - df['วันวางบิล']).dt.days
+    df['ระยะเวลาที่กำหนด'] = (df['วันที่จะได้รับ/จ่าย'] - df['วันวางบิล']).dt.days
+    df['diff']             = df['ระยะเวลา'] - df['ระยะเวลาที่กำหนด']
+    return compact(df)
+
+
+def compact(df):
+    """ชื่อ / ประเภท เป็น category และจำนวนวันเป็น int32 (ถ้าไม่มีค่าว่าง)"""
+    df = df.copy(deep=False)
+    for col in CATEGORY_COLS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    for col in HIDDEN_COLS:
+        if col in df.columns and df[col].notna().all():
+            df[col] = df[col].astype(np.int32)
+    return df
+
+
+def memory_report(df):
+    """หน่วยความจำ (MB) ของ ledger เทียบกับแบบเดิม (ข้อความเป็น object, จำนวนวันเป็น int64)"""
+    after = df.memory_usage(deep=True).sum()
+    before = df.memory_usage(index=True).iloc[0]
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            before += df[col].astype(object).memory_usage(deep=True, index=False)
+        elif df[col].dtype == np.int32:
+            before += len(df) * 8
+        else:
+            before += df[col].memory_usage(deep=True, index=False)
+    return {'before_mb': before / 2**20, 'after_mb': after / 2**20}
+
+
+def load(file, reader=readers.DEFAULT_READER):
+    """อ่านไฟล์ ตรวจคอลัมน์ และเตรียมข้อมูลให้พร้อมคำนวณ"""
+    df = read_excel(file, reader)
+    missing = missing_columns(df)
+    if missing:
+        raise MissingColumnsError(missing)
+    return prepare(df)
+
+
+def display_frame(df):
+    return df.drop(columns=HIDDEN_COLS, errors='ignore')
+
+
+def _today():
+    return pd.Timestamp.today().normalize()
+
+
+def filter_actual(df, end_date=None):
+    """เลือกเฉพาะรายการที่จ่ายจริงแล้วจนถึง end_date"""
+    end_date = _today() if end_date is None else end_date
+    start_date = df['วันที่จ่ายจริง'].min()
+    mask = (df['วันที่จ่ายจริง'] >= start_date) & (df['วันที่จ่ายจริง'] <= end_date)
+    return df.loc[mask]
+
+
+def ar_ap_days(df_filtered):
+    """AR / AP DAYS และค่าเฉลี่ยช้า/เร็ว (None ถ้าไม่มีข้อมูล)"""
+    result = {'ar_days': None, 'ar_ontime': None, 'ap_days': None, 'ap_ontime': None}
+
+    df_ar = df_filtered[df_filtered['ประเภท'] == 'ลูกหนี้']
+    df_ap = df_filtered[df_filtered['ประเภท'] == 'เจ้าหนี้']
+    if not df_ar.empty:
+        result['ar_days']   = int(df_ar['ระยะเวลา'].mean().round())
+        result['ar_ontime'] = int(df_ar['diff'].mean().round())
+    if not df_ap.empty:
+        result['ap_days']   = int(df_ap['ระยะเวลา'].mean().round())
+        result['ap_ontime'] = int(df_ap['diff'].mean().round())
+    return result
+
+
+def _by_name(df):
+    """factorize ชื่อ เป็นรหัสจำนวนเต็ม (เรียงตามชื่อ) ใช้เป็น key ของ groupby แทนข้อความ"""
+    codes, names = pd.factorize(df['ชื่อ'], sort=True)
+    return codes, pd.Index(np.asarray(names), name='ชื่อ')
+
+
+def _lookup(names, values):
+    """ค่าของ values (index = ชื่อ) ต่อแถวตาม names, NaN ถ้าไม่มี ไม่ต้อง merge ทั้ง ledger"""
+    if isinstance(names.dtype, pd.CategoricalDtype):
+        by_code = values.reindex(names.cat.categories).to_numpy(dtype=float)
+        codes = names.cat.codes.to_numpy()
+        return np.where(codes >= 0, by_code[codes], np.nan)
+    return values.reindex(names).to_numpy(dtype=float)
+
+
+def debtor_table(df_filtered):
+    """สถิติลูกหนี้ต่อราย จาก groupby เดียว"""
+    dfar = df_filtered[df_filtered['ประเภท'] == 'ลูกหนี้']
+    codes, names = _by_name(dfar)
+    known = codes >= 0
+
+    table = (
+        pd.DataFrame({
+            'ระยะเวลา': dfar['ระยะเวลา'].to_numpy()[known],
+            'จำนวนเงิน': dfar['จำนวนเงิน'].to_numpy()[known],
+            'late': (dfar['diff'] > 0).to_numpy()[known],
+            'diff': dfar['diff'].to_numpy()[known],
+        })
+        .groupby(codes[known])
+        .agg(
+            avg_duration=('ระยะเวลา', 'mean'),
+            total_amount=('จำนวนเงิน', 'sum'),
+            late_freq=('late', 'sum'),
+            total_count=('diff', 'count'),
+        )
+    )
+    table.index = names[table.index]
+    return late_grades(table)
+
+
+def late_grades(table):
+    """เพิ่ม % จ่ายเกินเวลา / grade / description จาก late_freq และ total_count"""
+    table['% จ่ายเกินเวลา'] = (table['late_freq'] / table['total_count'] * 100).round(0).fillna(0)
+    table['grade'] = pd.cut(table['% จ่ายเกินเวลา'], bins=BINS, labels=GRADES, right=True)
+    table['description'] = pd.cut(table['% จ่ายเกินเวลา'], bins=BINS, right=True)
+    return table
+
+
+def creditor_table(df_filtered):
+    """สถิติเจ้าหนี้ต่อราย จาก groupby เดียว"""
+    dfap = df_filtered[df_filtered['ประเภท'] == 'เจ้าหนี้']
+    codes, names = _by_name(dfap)
+    known = codes >= 0
+
+    table = (
+        pd.DataFrame({
+            'ระยะเวลาที่กำหนด': dfap['ระยะเวลาที่กำหนด'].to_numpy()[known],
+            'จำนวนเงิน': dfap['จำนวนเงิน'].to_numpy()[known],
+        })
+        .groupby(codes[known])
+        .agg(
+            ap_avg_term=('ระยะเวลาที่กำหนด', 'mean'),
+            ap_total_amount=('จำนวนเงิน', 'sum'),
+        )
+    )
+    table.index = names[table.index]
+    return table
+
+
+def party_stats(df_filtered, debtors=None, creditors=None):
+    """ตารางสถิติต่อคู่ค้า (ลูกหนี้ + เจ้าหนี้) หนึ่งแถวต่อชื่อ"""
+    debtors = debtor_table(df_filtered) if debtors is None else debtors
+    creditors = creditor_table(df_filtered) if creditors is None else creditors
+    return debtors.join(creditors, how='outer')
+
+
+def debtor_views(debtors):
+    """คืนค่า (avg_duration, total_amount, late_pct) สำหรับแสดงผล จาก debtor_table()"""
+    avg_duration = debtors['avg_duration'].round(0).sort_values(ascending=False).to_frame()
+    total_amount = debtors['total_amount'].round(0).sort_values(ascending=False).to_frame()
+    late_pct = debtors[['% จ่ายเกินเวลา', 'grade', 'description']]
+    return avg_duration, total_amount, late_pct
+
+
+def debtor_stats(df_filtered):
+    """คืนค่า (avg_duration, total_amount, late_pct) ของลูกหนี้"""
+    return debtor_views(debtor_table(df_filtered))
+
+
+def risk_table(late_pct):
+    return late_pct.sort_values('% จ่ายเกินเวลา', ascending=False)[['% จ่ายเกินเวลา', 'grade']]
+
+
+def creditor_views(creditors):
+    """คืนค่า (avg_durationap, total_amountap) 10 อันดับที่น้อยสุด จาก creditor_table()"""
+    avg_durationap = (
+        creditors['ap_avg_term'].sort_values(ascending=True).head(10)
+        .rename('ระยะเวลาเฉลี่ย (น้อยสุด 10 อันดับ)').to_frame().round(0)
+    )
+    total_amountap = (
+        creditors['ap_total_amount'].sort_values(ascending=True).head(10)
+        .rename('ยอดเงินรวม (น้อยสุด 10 อันดับ)').to_frame().round(0)
+    )
+    return avg_durationap, total_amountap
+
+
+def creditor_stats(df_filtered):
+    """คืนค่า (avg_durationap, total_amountap) 10 อันดับที่น้อยสุดของเจ้าหนี้"""
+    return creditor_views(creditor_table(df_filtered))
+
+
+def daily_flows(df, late_pct):
+    """กระแสเงินสดรับ/จ่าย/สุทธิ และ risk_pct รายวันแบบเต็มช่วงวันที่ (index = วันที่)
+
+    ไม่ขึ้นกับเงินสดยกมา ใช้ cumulative() ต่อเพื่อได้เงินสดสะสม
+    """
+    dfcashflow = df[['วันที่จ่ายจริง', 'ประเภท', 'จำนวนเงิน']].copy(deep=False)
+    dfcashflow['riskamt'] = (_lookup(df['ชื่อ'], late_pct['% จ่ายเกินเวลา'])/100) * dfcashflow['จำนวนเงิน']
+    dfcashflow['cash_in']  = dfcashflow['จำนวนเงิน'].where(dfcashflow['จำนวนเงิน'] > 0, 0)
+    dfcashflow['cash_out'] = dfcashflow['จำนวนเงิน'].where(dfcashflow['จำนวนเงิน'] < 0, 0)
+
+    df_grouped = dfcashflow.groupby('วันที่จ่ายจริง').agg({'cash_in': 'sum', 'cash_out': 'sum'})
+
+    df_debtors = dfcashflow[dfcashflow['ประเภท'] == 'ลูกหนี้']
+    df_daily_risk = (
+        df_debtors.groupby('วันที่จ่ายจริง')
+        .agg({'riskamt': 'sum', 'จำนวนเงิน': 'sum'})
+        .rename(columns={'riskamt': 'total_riskamt', 'จำนวนเงิน': 'total_amount'})
+    )
+    return daily_frame(df_grouped, df_daily_risk)
+
+
+def daily_frame(df_grouped, df_daily_risk):
+    """daily_flows() จากยอดรายวัน: cash_in/cash_out และ total_riskamt/total_amount (index = วันที่จ่ายจริง)"""
+    df_daily_risk = df_daily_risk.reset_index()
+    df_daily_risk['risk_ratio'] = df_daily_risk['total_riskamt'] / df_daily_risk['total_amount']
+    df_daily_risk['risk_pct']   = (df_daily_risk['risk_ratio'] * 100).round(2)
+
+    df_grouped = pd.merge(
+        df_grouped.reset_index(), df_daily_risk, on='วันที่จ่ายจริง', how='left'
+    ).fillna({'total_riskamt': 0, 'total_amount': 0, 'risk_ratio': 0, 'risk_pct': 0})
+
+    start_date2 = df_grouped['วันที่จ่ายจริง'].min()
+    end_date2   = df_grouped['วันที่จ่ายจริง'].max()
+    date_range  = pd.date_range(start=start_date2, end=end_date2, freq='D')
+    df_dates    = pd.DataFrame({'วันที่': date_range})
+
+    df_grouped = df_grouped.rename(columns={'วันที่จ่ายจริง': 'วันที่'})
+    df_flows = df_dates.merge(df_grouped, on='วันที่', how='left').fillna(0)
+
+    df_flows['net_cash'] = df_flows['cash_in'] + df_flows['cash_out']
+    df_flows['net_cumsum'] = df_flows['net_cash'].cumsum()
+    df_flows['วันที่'] = pd.to_datetime(df_flows['วันที่'])
+    df_flows = df_flows.set_index('วันที่')
+
+    return df_flows.rename(columns={
+        'cash_in': 'กระแสเงินสดรับ',
+        'cash_out': 'กระแสเงินสดจ่าย',
+        'net_cash': 'กระแสเงินสดสุทธิ'
+    })
+
+
+def cumulative(df_flows, cash_accum=0.0, today=None):
+    """เพิ่มเงินสดสะสม (= net_cumsum + เงินสดยกมา) และแยก สะสมจริง / สะสมคาดการณ์"""
+    today = _today() if today is None else today
+
+    df_merged = df_flows.drop(columns='net_cumsum')
+    df_merged.insert(
+        df_merged.columns.get_loc('กระแสเงินสดสุทธิ') + 1,
+        'เงินสดสะสม', df_flows['net_cumsum'] + cash_accum
+    )
+    df_merged['สะสมจริง'] = df_merged['เงินสดสะสม'].where(df_merged.index <= today)
+    df_merged['สะสมคาดการณ์'] = df_merged['เงินสดสะสม'].where(df_merged.index > today)
+    return df_merged
+
+
+def daily_cashflow(df, late_pct, cash_accum=0.0, today=None):
+    """ตารางกระแสเงินสดรายวันแบบเต็มช่วงวันที่ (index = วันที่)"""
+    return cumulative(daily_flows(df, late_pct), cash_accum, today)
+
+
+def from_today(df_merged, today=None):
+    today = _today() if today is None else today
+    return df_merged.loc[df_merged.index >= today, [
+        'กระแสเงินสดรับ', 'กระแสเงินสดจ่าย', 'กระแสเงินสดสุทธิ', 'เงินสดสะสม', 'risk_pct'
+    ]]
+
+
+def payables(df, df_merged, today=None):
+    """เจ้าหนี้ที่ครบกำหนดตั้งแต่วันนี้ พร้อมเงินสดสะสม ณ วันครบกำหนด"""
+    today = _today() if today is None else today
+
+    df_cashout = (
+        df.loc[(pd.to_datetime(df['วันที่จะได้รับ/จ่าย']) >= today) & (df['จำนวนเงิน'] < 0)]
+        [['วันที่จะได้รับ/จ่าย', 'ชื่อ', 'จำนวนเงิน']].copy()
+    )
+    df_cashout.columns = ['วันที่', 'ชื่อเจ้าหนี้', 'จำนวนเงิน']
+    df_cashout['วันที่'] = pd.to_datetime(df_cashout['วันที่'])
+
+    return (
+        df_cashout.merge(df_merged[['เงินสดสะสม']], left_on='วันที่', right_index=True, how='left')
+        # เรียงแบบ stable ด้วยคีย์รอง ให้แผนไม่ขึ้นกับลำดับแถวใน ledger
+        .sort_values(['วันที่', 'ชื่อเจ้าหนี้', 'จำนวนเงิน'], kind='stable')
+    )
+
+
+def next_at_or_above(cash, threshold):
+    """ตำแหน่งวันถัดไป (หลังวันนั้น) ที่เงินสดสะสม >= threshold ของทุกวัน, len(cash) ถ้าไม่มี"""
+    cash = np.asarray(cash, dtype=float)
+    n = len(cash)
+    pos = np.where(cash >= threshold, np.arange(n), n)
+    nxt = np.minimum.accumulate(pos[::-1])[::-1]
+    return np.append(nxt[1:], n)
+
+
+def plan_deferrals(df, df_merged, threshold=0.0, today=None, mode='static'):
+    """เลื่อนเจ้าหนี้ที่เงินสดสะสมต่ำกว่า threshold
+
+    mode='static'   : ไปวันแรกที่เงินสดสะสมเดิมถึง threshold
+    mode='balanced' : คิดยอดที่เลื่อนไปแล้วด้วย เลื่อนแต่ละรายการไปวันที่เงินสดสะสมไม่ต่ำกว่า threshold อีกจนจบช่วง
+                      (หรือวันที่สูงสุดถ้าช่วงไม่กลับมาถึง)
+    """
+    today = _today() if today is None else today
+    df_merged = df_merged.loc[df_merged.index >= today]
+    df_cashout = payables(df, df_merged, today)
+
+    if mode == 'balanced':
+        return _plan_balanced(df_merged, df_cashout, threshold)
+    if mode != 'static':
+        raise ValueError(f"unknown mode: {mode}")
+
+    pos = df_merged.index.get_indexer(df_cashout['วันที่'])
+    cash = df_cashout['เงินสดสะสม'].to_numpy(dtype=float)
+    nxt = next_at_or_above(df_merged['เงินสดสะสม'], threshold)
+    new_pos = np.where(pos >= 0, nxt[pos], len(df_merged))
+
+    deferred = (cash < threshold) & (pos >= 0) & (new_pos < len(df_merged))
+    df_cashout = df_cashout[deferred]
+    return pd.DataFrame({
+        'ชื่อเจ้าหนี้': df_cashout['ชื่อเจ้าหนี้'].to_numpy(),
+        'วันที่เดิม': df_cashout['วันที่'].to_numpy(),
+        'วันที่จ่ายใหม่': df_merged.index[new_pos[deferred]],
+        'จำนวนเงินที่เลื่อน': df_cashout['จำนวนเงิน'].to_numpy()
+    }, columns=PLAN_COLS)
+
+
+def _plan_balanced(df_merged, df_cashout, threshold):
+    """เลื่อนทีละรายการตามวันครบกำหนด โดยดูเงินสดสะสมที่รวมผลของรายการที่เลื่อนไปแล้ว (segment tree)
+
+    รายการที่อยู่ในช่วงที่เงินสดสะสมเดิมต่ำกว่า threshold (วันครบกำหนด p ถึงวันที่ static ใช้ e) ไปวันถัดจาก
+    วันสุดท้ายใน [p, e) ที่เงินสดสะสมปัจจุบันยังต่ำกว่า threshold ถ้าไม่มีวันนั้นแล้ว ไม่ต้องเลื่อน
+    จึงไม่เลื่อนนานกว่า static และวันที่ยังต่ำกว่า threshold ก็ต่ำกว่าในแผน static ด้วย
+    ช่วงสุดท้ายที่ไม่กลับมาถึง threshold ไปวันที่เงินสดสะสมสูงสุดหลังจากนั้นเมื่อสูงกว่าวันครบกำหนด (ยกขึ้นได้บางส่วน)
+    การเลื่อนจากวัน p ไปวัน q เพิ่มเงินสดสะสมช่วง [p, q) เท่านั้น วันอื่นไม่ลดลง
+    """
+    n = len(df_merged)
+    cash = df_merged['เงินสดสะสม'].to_numpy(dtype=float)
+    nxt = next_at_or_above(cash, threshold)
+    low = MinSegmentTree(cash)
+    # ค่าติดลบ: ค่าต่ำสุดคือเงินสดสะสมสูงสุด ใช้หาวันที่สูงสุดเมื่อช่วงไม่กลับมาถึง threshold
+    high = MinSegmentTree(-cash)
+
+    pos = df_merged.index.get_indexer(df_cashout['วันที่'])
+    amounts = df_cashout['จำนวนเงิน'].to_numpy(dtype=float)
+
+    rows, new_pos = [], []
+    for i, (p, amount) in enumerate(zip(pos, amounts)):
+        if p < 0 or cash[p] >= threshold:
+            continue
+        q = low.last_below(p, nxt[p], threshold) + 1
+        if q == 0:
+            continue
+        if q >= n:
+            if p + 1 >= n:
+                continue
+            best = high.range_min(p + 1, n)
+            if -best <= low.get(p):
+                continue
+            q = high.first_at_or_below(p + 1, best)
+        low.range_add(p, q, -amount)
+        high.range_add(p, q, amount)
+        rows.append(i)
+        new_pos.append(q)
+
+    df_cashout = df_cashout.iloc[rows]
+    return pd.DataFrame({
+        'ชื่อเจ้าหนี้': df_cashout['ชื่อเจ้าหนี้'].to_numpy(),
+        'วันที่เดิม': df_cashout['วันที่'].to_numpy(),
+        'วันที่จ่ายใหม่': df_merged.index[np.asarray(new_pos, dtype=int)],
+        'จำนวนเงินที่เลื่อน': df_cashout['จำนวนเงิน'].to_numpy()
+    }, columns=PLAN_COLS)
+
+
+def apply_deferrals(df_merged, df_payment_plan, today=None):
+    """เงินสดสะสม ก่อน–หลังเลื่อนชำระ ตั้งแต่วันนี้"""
+    today = _today() if today is None else today
+    df_merged = df_merged.loc[df_merged.index >= today]
+
+    amt = df_payment_plan['จำนวนเงินที่เลื่อน'].to_numpy(dtype=float)
+    orig = df_merged.index.get_indexer(df_payment_plan['วันที่เดิม'])
+    new = df_merged.index.get_indexer(df_payment_plan['วันที่จ่ายใหม่'])
+
+    delta = np.zeros(len(df_merged))
+    np.add.at(delta, orig[orig >= 0], -amt[orig >= 0])
+    np.add.at(delta, new[new >= 0], amt[new >= 0])
+
+    return pd.DataFrame({
+        'ก่อนเลื่อน': df_merged['เงินสดสะสม'],
+        'หลังเลื่อน': df_merged['เงินสดสะสม'] + delta.cumsum()
+    })
@@ -0,0 +1,104 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import engine
+
+
+SORTABLE = engine.DATE_COLS + ['จำนวนเงิน', 'ชื่อ']
+
+
+class LedgerIndex:
+    """ดัชนีของ ledger สำหรับกรอง/เรียง/แบ่งหน้าฝั่ง server
+
+    - ลำดับการเรียง (argsort) ของแต่ละคอลัมน์คำนวณครั้งเดียว
+    - ช่วงวันที่/ยอดเงิน หาได้ด้วย searchsorted บนค่าที่เรียงแล้ว
+    - แถวของแต่ละชื่อ/ประเภท เก็บเป็นกลุ่มไว้ล่วงหน้า
+    - ผลกรอง+เรียงล่าสุดถูก cache ไว้ การเปลี่ยนหน้าจึงเป็นแค่ slice ขนาด page
+    """
+
+    def __init__(self, df, max_cached=16):
+        self.df = engine.display_frame(df)
+        self.n = len(self.df)
+        self._orders = {}
+        self._groups = {}
+        self._rows = OrderedDict()
+        self.max_cached = max_cached
+
+    def order(self, column):
+        if column not in self._orders:
+            values = self.df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype(str)
+            self._orders[column] = np.argsort(values.to_numpy(), kind='stable')
+        return self._orders[column]
+
+    def _sorted_values(self, column):
+        return self.df[column].to_numpy()[self.order(column)]
+
+    def groups(self, column):
+        """{ค่า: ตำแหน่งแถว} ของคอลัมน์ที่เป็นกลุ่ม (ชื่อ / ประเภท)"""
+        if column not in self._groups:
+            codes, uniques = pd.factorize(self.df[column])
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            self._groups[column] = {
+                value: order[bounds[i]:bounds[i + 1]] for i, value in enumerate(uniques)
+            }
+        return self._groups[column]
+
+    def options(self, column):
+        return sorted(self.groups(column))
+
+    def _in_range(self, column, lo, hi):
+        values = self._sorted_values(column)
+        start = 0 if lo is None else np.searchsorted(values, lo, side='left')
+        stop = len(values) if hi is None else np.searchsorted(values, hi, side='right')
+        return self.order(column)[start:stop]
+
+    def select(self, names=None, types=None, date_col='วันที่จ่ายจริง', date_range=None, amount_range=None):
+        """mask ของแถวที่ผ่านทุกตัวกรอง (None = ไม่กรอง)"""
+        mask = np.ones(self.n, dtype=bool)
+
+        def keep(rows):
+            m = np.zeros(self.n, dtype=bool)
+            m[rows] = True
+            mask[:] &= m
+
+        for column, wanted in (('ชื่อ', names), ('ประเภท', types)):
+            if wanted:
+                groups = self.groups(column)
+                keep(np.concatenate([groups.get(v, np.array([], dtype=np.intp)) for v in wanted]))
+        if date_range is not None:
+            lo, hi = (None if d is None else np.datetime64(pd.Timestamp(d)) for d in date_range)
+            keep(self._in_range(date_col, lo, hi))
+        if amount_range is not None:
+            keep(self._in_range('จำนวนเงิน', *amount_range))
+        return mask
+
+    def rows(self, sort='วันที่จ่ายจริง', ascending=True, **filters):
+        """ตำแหน่งแถวที่ผ่านตัวกรอง เรียงตาม sort"""
+        key = (sort, ascending, tuple(sorted((k, _hashable(v)) for k, v in filters.items())))
+        if key in self._rows:
+            self._rows.move_to_end(key)
+            return self._rows[key]
+
+        order = self.order(sort)
+        if not ascending:
+            order = order[::-1]
+        rows = order[self.select(**filters)[order]]
+        self._rows[key] = rows
+        if len(self._rows) > self.max_cached:
+            self._rows.popitem(last=False)
+        return rows
+
+    def page(self, rows, page=1, page_size=100):
+        start = (page - 1) * page_size
+        return self.df.iloc[rows[start:start + page_size]]
+
+
+def _hashable(value):
+    if isinstance(value, (list, tuple, set)):
+        return tuple(value)
+    return value
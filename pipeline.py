@@ -0,0 +1,227 @@
+from collections import OrderedDict
+from functools import wraps
+
+import pandas as pd
+
+import aging
+import asof
+import cube
+import engine
+import ledger_view
+import scenarios
+import scheduler
+import shortfall
+import simulate
+import trends
+
+
+def stage(maxsize=8):
+    """จำผลของแต่ละขั้นตอนตามอาร์กิวเมนต์ที่ใช้จริง (LRU ต่อ instance)"""
+    def decorator(method):
+        name = method.__name__
+
+        @wraps(method)
+        def wrapper(self, *args):
+            memo = self._memo.setdefault(name, OrderedDict())
+            if args in memo:
+                memo.move_to_end(args)
+                return memo[args]
+            result = method(self, *args)
+            memo[args] = result
+            if len(memo) > maxsize:
+                memo.popitem(last=False)
+            return result
+        return wrapper
+    return decorator
+
+
+def plan_deferrals(df, df_merged, threshold, today, mode='static', priority=()):
+    """engine.plan_deferrals() สำหรับ static / balanced, scheduler.plan_deferrals() สำหรับ greedy / milp"""
+    if mode in scheduler.MODES:
+        return scheduler.plan_deferrals(df, df_merged, threshold, today, mode, priority)
+    return engine.plan_deferrals(df, df_merged, threshold, today, mode)
+
+
+class Pipeline:
+    """ขั้นตอนคำนวณของ t5.py ต่อ ledger หนึ่งไฟล์ แต่ละขั้นคำนวณใหม่เฉพาะเมื่ออินพุตของขั้นนั้นเปลี่ยน
+
+    parsed frame → filtered (today) → debtor/creditor stats → daily flows → cumulative (cash_accum) → plan (threshold)
+    ผลลัพธ์ที่คืนมาถูกใช้ร่วมกัน ห้ามแก้ไขในที่
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._memo = {}
+
+    @stage()
+    def memory_report(self):
+        return engine.memory_report(self.df)
+
+    @stage()
+    def ledger_index(self):
+        return ledger_view.LedgerIndex(self.df)
+
+    @stage()
+    def filtered(self, today):
+        return engine.filter_actual(self.df, today)
+
+    @stage()
+    def ar_ap_days(self, today):
+        return engine.ar_ap_days(self.filtered(today))
+
+    @stage()
+    def debtor_table(self, today):
+        return engine.debtor_table(self.filtered(today))
+
+    @stage()
+    def creditor_table(self, today):
+        return engine.creditor_table(self.filtered(today))
+
+    @stage()
+    def party_stats(self, today):
+        return engine.party_stats(None, self.debtor_table(today), self.creditor_table(today))
+
+    @stage()
+    def debtor_stats(self, today):
+        return engine.debtor_views(self.debtor_table(today))
+
+    @stage()
+    def risk_table(self, today):
+        return engine.risk_table(self.debtor_stats(today)[2])
+
+    @stage()
+    def creditor_stats(self, today):
+        return engine.creditor_views(self.creditor_table(today))
+
+    @stage()
+    def daily_flows(self, today):
+        return engine.daily_flows(self.df, self.debtor_stats(today)[2])
+
+    @stage()
+    def daily_cashflow(self, today, cash_accum):
+        # เงินสดยกมาเปลี่ยน = บวกค่าคงที่กับ cumsum ที่ cache ไว้ O(n)
+        return engine.cumulative(self.daily_flows(today), cash_accum, today)
+
+    @stage()
+    def from_today(self, today, cash_accum):
+        return engine.from_today(self.daily_cashflow(today, cash_accum), today)
+
+    @stage(maxsize=32)
+    def plan_deferrals(self, today, cash_accum, threshold, mode='static', priority=()):
+        return plan_deferrals(self.df, self.daily_cashflow(today, cash_accum), threshold, today, mode, priority)
+
+    @stage(maxsize=32)
+    def apply_deferrals(self, today, cash_accum, threshold, mode='static', priority=()):
+        return engine.apply_deferrals(
+            self.daily_cashflow(today, cash_accum),
+            self.plan_deferrals(today, cash_accum, threshold, mode, priority),
+            today
+        )
+
+    @stage()
+    def cash_cube(self, today, by=None, names=None):
+        if by is None:
+            return cube.CashCube.from_flows(self.daily_flows(today))
+        return cube.CashCube.from_ledger(self.df, self.debtor_stats(today)[2], self.daily_flows(today).index, by, names)
+
+    @stage(maxsize=16)
+    def cash_rollup(self, today, cash_accum, granularity='D', by=None, names=None):
+        # เงินสดยกมาเป็นของทั้งกิจการ ไม่บวกให้กลุ่มย่อย
+        opening = cash_accum if by is None else 0.0
+        return self.cash_cube(today, by, names).rollup(granularity, today, opening)
+
+    @stage()
+    def aging_table(self, today):
+        return aging.aging_table(self.df, today)
+
+    @stage(maxsize=32)
+    def shortfalls(self, today, cash_accum, threshold):
+        return shortfall.shortfalls(self.df, self.daily_cashflow(today, cash_accum)['เงินสดสะสม'], threshold, today)
+
+    @stage(maxsize=4)
+    def scenario_grid(self, today, thresholds, balances):
+        return scenarios.grid(self.df, self.daily_flows(today), today, thresholds, balances)
+
+    @stage()
+    def rolling_days(self, today, names=None):
+        return trends.rolling_days(self.filtered(today), trends.WINDOWS, names)
+
+    @stage()
+    def monthly_days(self, today, by_name=False):
+        return trends.monthly_days(self.filtered(today), by_name)
+
+    @stage(maxsize=4)
+    def simulation(self, today, cash_accum, threshold, paths=simulate.PATHS, horizon=simulate.HORIZON, seed=0):
+        return simulate.simulate(
+            self.df, self.daily_cashflow(today, cash_accum), self.filtered(today), today,
+            threshold, paths, horizon, seed, simulate.default_workers(paths)
+        )
+
+    def report(self, today, cash_accum=0.0, threshold=0.0, mode='static', priority=()):
+        """ผลลัพธ์ทั้งหมดของ t5.py เป็น dict ของ DataFrame (และ ar_ap_days เป็น dict)"""
+        return {
+            'ar_ap_days': self.ar_ap_days(today),
+            'party_stats': self.party_stats(today),
+            'risk_table': self.risk_table(today),
+            'daily': self.daily_cashflow(today, cash_accum),
+            'plan': self.plan_deferrals(today, cash_accum, threshold, mode, priority),
+            'compare': self.apply_deferrals(today, cash_accum, threshold, mode, priority),
+            'shortfalls': self.shortfalls(today, cash_accum, threshold),
+        }
+
+
+class SnapshotPipeline(Pipeline):
+    """Pipeline สำหรับเลื่อนดูข้อมูล ณ วันที่ต่าง ๆ: สถิติคู่ค้า กระแสเงินสดรายวัน และจุดเริ่มของแผนเลื่อนชำระ
+    มาจาก asof.AsOfIndex ที่สร้างครั้งเดียว แทนการกรองและ groupby ทั้ง ledger ทุกครั้งที่วันที่เปลี่ยน
+    """
+
+    @stage(maxsize=1)
+    def as_of_index(self):
+        return asof.AsOfIndex(self.df)
+
+    @stage()
+    def snapshot(self, today):
+        return self.as_of_index().stats(today)
+
+    @stage()
+    def ar_ap_days(self, today):
+        return self.snapshot(today).ar_ap_days()
+
+    @stage()
+    def debtor_table(self, today):
+        return self.snapshot(today).debtor_table()
+
+    @stage()
+    def creditor_table(self, today):
+        return self.snapshot(today).creditor_table()
+
+    @stage()
+    def daily_flows(self, today):
+        return self.snapshot(today).daily_flows(self.debtor_stats(today)[2])
+
+    @stage(maxsize=32)
+    def plan_deferrals(self, today, cash_accum, threshold, mode='static', priority=()):
+        return plan_deferrals(
+            self.as_of_index().payables(today), self.daily_cashflow(today, cash_accum), threshold, today, mode, priority
+        )
+
+
+class StoredPipeline(SnapshotPipeline):
+    """SnapshotPipeline ของ ledger ใน store.LedgerStore: วันที่ตรงกับ stats.as_of ใช้ยอดรวมที่ store ปรับไว้แล้ว
+    โดยไม่ต้องสร้าง AsOfIndex ทั้ง ledger ; ลำดับแถวจาก store.load() ต่างจากไฟล์ได้ แต่แผนเลื่อนชำระเท่ากับ Pipeline
+    """
+
+    def __init__(self, df, stats):
+        super().__init__(df)
+        self.stats = stats
+
+    @stage()
+    def snapshot(self, today):
+        if pd.Timestamp(today) == self.stats.as_of:
+            return self.stats
+        return self.as_of_index().stats(today)
+
+    @stage(maxsize=32)
+    def plan_deferrals(self, today, cash_accum, threshold, mode='static', priority=()):
+        df = self.df if pd.Timestamp(today) == self.stats.as_of else self.as_of_index().payables(today)
+        return plan_deferrals(df, self.daily_cashflow(today, cash_accum), threshold, today, mode, priority)
@@ -0,0 +1,128 @@
+import datetime as dt
+import importlib.util
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import diagnostics
+
+
+DEFAULT_READER = os.environ.get('CASHFLOW_EXCEL_READER', 'auto')
+
+
+def _wanted(columns):
+    return None if columns is None else (lambda c: c in columns)
+
+
+def read_pandas(file, columns=None):
+    """pd.read_excel แบบเดิม (openpyxl อ่านทั้งไฟล์)"""
+    return pd.read_excel(file, usecols=_wanted(columns))
+
+
+def read_calamine(file, columns=None):
+    """อ่านด้วย calamine (Rust) ผ่าน pandas ต้องมี python-calamine"""
+    return pd.read_excel(file, engine='calamine', usecols=_wanted(columns))
+
+
+def read_openpyxl_stream(file, columns=None):
+    """อ่าน openpyxl แบบ read_only ทีละแถว เก็บเฉพาะคอลัมน์ที่ต้องใช้แล้วสร้างทีละคอลัมน์"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file, read_only=True, data_only=True)
+    try:
+        # ชีตแรกเหมือน pd.read_excel (wb.active คือชีตที่เปิดอยู่ตอนบันทึก)
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, ())
+        picked = [
+            (i, name) for i, name in enumerate(header)
+            if name is not None and (columns is None or name in columns)
+        ]
+        values = {name: [] for _, name in picked}
+        for row in rows:
+            cells = [row[i] if i < len(row) else None for i, _ in picked]
+            if all(v is None for v in cells):
+                continue
+            for (_, name), v in zip(picked, cells):
+                values[name].append(v)
+    finally:
+        wb.close()
+
+    return pd.DataFrame({name: _typed(v) for name, v in values.items()})
+
+
+def _typed(values):
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, dt.datetime) for v in present):
+        return pd.to_datetime(values)
+    if present and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        if len(present) == len(values) and all(isinstance(v, int) for v in present):
+            return np.fromiter(values, dtype=np.int64, count=len(values))
+        return np.fromiter((np.nan if v is None else v for v in values), dtype=float, count=len(values))
+    return pd.Series(values)
+
+
+READERS = {
+    'calamine': read_calamine,
+    'openpyxl': read_openpyxl_stream,
+    'pandas': read_pandas,
+}
+
+
+def available():
+    names = []
+    if importlib.util.find_spec('python_calamine') is not None:
+        names.append('calamine')
+    if importlib.util.find_spec('openpyxl') is not None:
+        names += ['openpyxl', 'pandas']
+    return names
+
+
+def read(file, reader=DEFAULT_READER, columns=None):
+    """อ่าน Excel ด้วย reader ที่เลือก ('auto' = calamine ถ้ามี ไม่งั้น openpyxl แบบ streaming)"""
+    if reader == 'auto':
+        reader = available()[0] if available() else 'pandas'
+    if reader not in READERS:
+        raise ValueError(f"unknown reader: {reader}")
+    return READERS[reader](file, columns)
+
+
+def _measure(name, data, columns):
+    """อ่านครั้งเดียว คืน (จำนวนแถว, วินาที, RSS สูงสุดที่เพิ่มจากก่อนอ่าน MB หรือ None)"""
+    measured = diagnostics.reset_peak_rss()
+    before = diagnostics.rss_mb()
+    t0 = time.perf_counter()
+    df = READERS[name](io.BytesIO(data), columns)
+    seconds = time.perf_counter() - t0
+    peak = diagnostics.peak_rss_mb()
+    return len(df), seconds, peak - before if measured and None not in (before, peak) else None
+
+
+def benchmark(file, columns=None, readers=None):
+    """จับเวลาและหน่วยความจำสูงสุดของแต่ละ reader กับไฟล์เดียวกัน
+
+    แต่ละ reader รันในโปรเซสใหม่ (spawn) แล้ววัด RSS สูงสุดที่เพิ่มขึ้น จึงนับหน่วยความจำของ calamine (Rust)
+    ที่ tracemalloc มองไม่เห็นด้วย ; peak_mb เป็น None เมื่อวัด RSS ไม่ได้ (นอก Linux)
+    """
+    data = file if isinstance(file, bytes) else Path(file).read_bytes()
+    rows = []
+    for name in readers or available():
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            n, seconds, peak = pool.submit(_measure, name, data, columns).result()
+        rows.append({'reader': name, 'rows': n, 'seconds': seconds, 'peak_mb': peak})
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    import sys
+
+    import engine
+
+    for path in sys.argv[1:]:
+        print(path)
+        print(benchmark(path, columns=engine.REQUIRED_COLS).to_string(index=False))
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+
+METRICS = {
+    'deferred_count': 'จำนวนรายการที่เลื่อน',
+    'deferred_amount': 'ยอดที่เลื่อน',
+    'min_balance': 'เงินสดสะสมต่ำสุดหลังเลื่อน',
+    'days_below': 'จำนวนวันที่ต่ำกว่า threshold หลังเลื่อน',
+}
+
+
+def _suffix_max_after(values):
+    """ค่าสูงสุดของ values หลังตำแหน่งนั้น (-inf ถ้าไม่มี)"""
+    rev = np.maximum.accumulate(values[::-1])[::-1]
+    return np.append(rev[1:], -np.inf)
+
+
+def _below(sorted_values, thresholds):
+    """จำนวนค่าใน sorted_values ที่ < threshold แต่ละค่า"""
+    return np.searchsorted(sorted_values, thresholds, side='left')
+
+
+def _after_static(cash, paid, thresholds):
+    """เงินสดสะสมหลังเลื่อนแบบ static (แถวละ threshold)
+
+    เจ้าหนี้ในช่วงที่ต่ำกว่า threshold ซึ่งมีวันถึง threshold ตามมา ไปจ่ายวันแรกที่ถึง จึงยกช่วงนั้นขึ้น
+    ด้วยยอดจ่ายสะสมในช่วง (paid = ยอดเจ้าหนี้ที่ครบกำหนดต่อวัน เป็นบวก) ; ช่วงสุดท้ายที่ไม่กลับมาถึงไม่เปลี่ยน
+    """
+    below = cash < thresholds[:, None]
+    days = np.arange(len(cash))
+    lifted = np.cumsum(np.where(below, paid, 0.0), axis=1)
+    # ตัดยอดสะสมที่ต้นช่วง: ลบยอด ณ วันล่าสุดที่ไม่ต่ำกว่า threshold
+    last_above = np.maximum.accumulate(np.where(below, -1, days), axis=1)
+    lifted -= np.where(last_above >= 0, np.take_along_axis(lifted, np.maximum(last_above, 0), axis=1), 0.0)
+    recovers = days < last_above[:, -1:]
+    return cash + np.where(recovers, lifted, 0.0)
+
+
+def grid(df, df_flows, today, thresholds, balances):
+    """ผลของแผนเลื่อนชำระแบบ static ทุกคู่ (threshold, เงินสดยกมา) จาก net_cumsum ที่คำนวณไว้แล้ว
+
+    เจ้าหนี้ถูกเลื่อนเมื่อ เงินสดสะสมวันครบกำหนด < threshold <= เงินสดสะสมสูงสุดหลังวันนั้น
+    การบวกเงินสดยกมาไม่เปลี่ยนลำดับ จึงเรียงครั้งเดียวแล้วนับทุก threshold ด้วย searchsorted
+    min_balance และ days_below คิดบนเงินสดสะสมหลังเลื่อน (_after_static) เหมือน apply_deferrals()
+    คืนตารางยาว: threshold, cash_accum, deferred_count, deferred_amount, min_balance, days_below
+    ค่าซ้ำในแกน (เช่น linspace ของช่วงที่ต้นเท่ากับปลาย) เหลือค่าเดียว ตารางจึง pivot ได้เสมอ
+    """
+    thresholds = np.unique(np.asarray(thresholds, dtype=float))
+    balances = np.unique(np.asarray(balances, dtype=float))
+    flows = df_flows.loc[df_flows.index >= today, 'net_cumsum']
+    cash = flows.to_numpy(dtype=float)
+
+    due = pd.to_datetime(df['วันที่จะได้รับ/จ่าย'])
+    payable = df.loc[(due >= today) & (df['จำนวนเงิน'] < 0)]
+    pos = flows.index.get_indexer(pd.to_datetime(payable['วันที่จะได้รับ/จ่าย']))
+    amounts = payable['จำนวนเงิน'].to_numpy(dtype=float)[pos >= 0]
+    pos = pos[pos >= 0]
+
+    # เลื่อนได้เมื่อ a < threshold <= b ; นับ = #(a < t) - #(max(a, b) < t)
+    a = cash[pos]
+    b = _suffix_max_after(cash)[pos] if len(cash) else a
+    upper = np.maximum(a, b)
+    order_a, order_u = np.argsort(a, kind='stable'), np.argsort(upper, kind='stable')
+    a_sorted, u_sorted = a[order_a], upper[order_u]
+    amount_a = np.append(0, np.cumsum(amounts[order_a]))
+    amount_u = np.append(0, np.cumsum(amounts[order_u]))
+    paid = np.bincount(pos, weights=-amounts, minlength=len(cash))
+
+    rows = []
+    for balance in balances:
+        n_a = _below(a_sorted + balance, thresholds)
+        n_u = _below(u_sorted + balance, thresholds)
+        after = _after_static(cash + balance, paid, thresholds)
+        rows.append(pd.DataFrame({
+            'threshold': thresholds,
+            'cash_accum': balance,
+            'deferred_count': n_a - n_u,
+            'deferred_amount': amount_a[n_a] - amount_u[n_u],
+            'min_balance': after.min(axis=1) if len(cash) else np.nan,
+            'days_below': (after < thresholds[:, None]).sum(axis=1),
+        }))
+    return pd.concat(rows, ignore_index=True)
+
+
+def heatmap_table(scenarios, metric):
+    """ตาราง เงินสดยกมา × threshold ของ metric"""
+    return scenarios.pivot(index='cash_accum', columns='threshold', values=metric)
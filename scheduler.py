@@ -0,0 +1,223 @@
+import heapq
+import importlib.util
+
+import numpy as np
+import pandas as pd
+
+import engine
+
+
+MODES = ('greedy', 'milp')
+# น้ำหนักของเจ้าหนี้ที่เลือกเป็นรายสำคัญ (รายอื่น = 1)
+PRIORITY_WEIGHT = 10.0
+# วันที่เลื่อนไปได้ต่อรายการใน MILP: วันครบกำหนด + วันของแผน greedy / static + วันที่เงินสดฟื้นถัดไป (รวมไม่เกินเท่านี้ + 2)
+MILP_CANDIDATES = 4
+MILP_TIME_LIMIT = 30.0
+
+
+def milp_available():
+    return importlib.util.find_spec('scipy') is not None
+
+
+def _weights(names, priority):
+    """น้ำหนักต่อรายการ: เจ้าหนี้ใน priority ได้ PRIORITY_WEIGHT"""
+    important = pd.Index(list(priority)).get_indexer(pd.Index(names, dtype=object)) >= 0
+    return np.where(important, PRIORITY_WEIGHT, 1.0)
+
+
+def _suffix_min(values):
+    return np.minimum.accumulate(values[::-1])[::-1]
+
+
+def _greedy_pass(base, pos, amounts, weights, items, floor):
+    """วันจ่ายของแต่ละรายการใน items (-1 = จ่ายไม่ได้ในช่วงนี้)
+
+    ไล่วันตามลำดับ รายการที่ครบกำหนดแล้วรอใน heap (น้ำหนักมากก่อน แล้ววันครบกำหนดก่อน)
+    จ่ายรายการบนสุดได้เมื่อเงินสดสะสมทุกวันหลังจากนี้ยังไม่ต่ำกว่า floor
+    ค่าเท่ากันตัดสินด้วยลำดับรายการ ซึ่ง engine.payables() เรียงตาม (วันครบกำหนด, เจ้าหนี้, ยอด) แบบ stable
+    แผนจึงไม่ขึ้นกับลำดับแถวใน ledger
+    """
+    n = len(base)
+    # ยอดจ่ายสะสม (ติดลบ) ต้องไม่ต่ำกว่า need[t] จึงไม่ทำให้วันใดหลังจากนี้ต่ำกว่า floor
+    need = -_suffix_min(np.maximum(base - floor, 0.0))
+    day = np.full(len(amounts), -1)
+    order = items[np.argsort(pos[items], kind='stable')]
+    starts = np.searchsorted(pos[order], np.arange(n + 1))
+
+    heap, paid = [], 0.0
+    for t in range(n):
+        for i in order[starts[t]:starts[t + 1]]:
+            heapq.heappush(heap, (-weights[i], pos[i], i))
+        while heap:
+            i = heap[0][2]
+            if paid + amounts[i] < need[t]:
+                break
+            heapq.heappop(heap)
+            paid += amounts[i]
+            day[i] = t
+    return day
+
+
+def _plan_greedy(cash, pos, amounts, weights, threshold):
+    """วันจ่ายใหม่ต่อรายการ ; เกณฑ์ต่อวันคือ min(threshold, เงินสดสะสมเมื่อไม่จ่ายเจ้าหนี้รายการใดเลย)
+
+    รายการที่ไม่มีวันไหนจ่ายได้ในช่วงนี้คงวันเดิม (เลื่อนไปก็ไม่ช่วย)
+    """
+    n = len(cash)
+    valid = np.flatnonzero(pos >= 0)
+    base = cash - np.bincount(pos[valid], weights=amounts[valid], minlength=n).cumsum()
+    day = _greedy_pass(base, pos, amounts, weights, valid, np.minimum(threshold, base))
+    return np.where(day >= 0, day, pos)
+
+
+def _candidates(cash, pos, amounts, planned):
+    """วันที่ให้เลือกต่อรายการ (-1 = ว่าง): วันครบกำหนด วันในแผน planned (เช่น greedy / static)
+    และวันที่เงินสดสะสมต่ำสุดในอนาคตขยับขึ้นถัดจากวันครบกำหนด
+    """
+    n = len(cash)
+    valid = pos >= 0
+    base = cash - np.bincount(pos[valid], weights=amounts[valid], minlength=n).cumsum()
+    future_min = _suffix_min(base)
+    rises = np.flatnonzero(np.diff(future_min) > 0) + 1
+    picks = np.searchsorted(rises, pos, side='right')[:, None] + np.arange(MILP_CANDIDATES - 1)
+    later = np.full(picks.shape, -1)
+    if len(rises):
+        later = np.where(picks < len(rises), rises[np.minimum(picks, len(rises) - 1)], -1)
+
+    # วันซ้ำในแถวเดียวกันเหลือหนึ่งตัว
+    options = np.sort(np.column_stack([pos, *planned, later]), axis=1)
+    options[:, 1:][options[:, 1:] == options[:, :-1]] = -1
+    return options
+
+
+def _static_days(cash, pos, threshold):
+    """วันจ่ายตาม engine.plan_deferrals(mode='static'): วันแรกหลังวันครบกำหนดที่เงินสดสะสมเดิมถึง threshold"""
+    n = len(cash)
+    nxt = engine.next_at_or_above(cash, threshold)[np.maximum(pos, 0)]
+    below = cash[np.maximum(pos, 0)] < threshold
+    return np.where((pos >= 0) & below & (nxt < n), nxt, pos)
+
+
+def _shortfall_and_delay(cash, pos, new_pos, amounts, weights, threshold):
+    """(ผลรวมส่วนที่เงินสดสะสมต่ำกว่า threshold, ผลรวม น้ำหนัก × วันที่เลื่อน) ของแผน new_pos"""
+    n = len(cash)
+    valid = pos >= 0
+    moved = np.bincount(new_pos[valid], weights=amounts[valid], minlength=n)
+    moved -= np.bincount(pos[valid], weights=amounts[valid], minlength=n)
+    after = cash + moved.cumsum()
+    return np.maximum(threshold - after, 0).sum(), ((new_pos - pos)[valid] * weights[valid]).sum()
+
+
+def _plan_milp(cash, pos, amounts, weights, threshold, time_limit=MILP_TIME_LIMIT):
+    """MILP (scipy / HiGHS): เลือกวันจ่ายหนึ่งวันต่อรายการ ลดผลรวม น้ำหนัก × วันที่เลื่อน
+
+    ตัวแปร x (รายการ × วันที่ให้เลือก), z_t เงินจ่ายสะสมถึงวัน t และ s_t ส่วนที่ต่ำกว่า threshold (ลงโทษหนัก)
+    z_t - z_(t-1) - (ยอดของรายการที่จ่ายวัน t) = 0 และ base_t + z_t + s_t >= threshold
+    วันที่ให้เลือกรวมวันของแผน greedy และ static ด้วย ; ถ้าคำตอบของ solver (เช่นหยุดเพราะครบ time_limit)
+    แย่กว่าแผน greedy ใช้แผน greedy แทน คืน (new_pos, ข้อความเมื่อไม่ได้คำตอบที่ดีที่สุดจาก solver หรือ None)
+    """
+    from scipy.optimize import Bounds, LinearConstraint, milp
+    from scipy.sparse import coo_array, vstack
+
+    n = len(cash)
+    valid = np.flatnonzero(pos >= 0)
+    if n == 0 or len(valid) == 0:
+        return pos, None
+
+    greedy = _plan_greedy(cash, pos, amounts, weights, threshold)
+    base = cash - np.bincount(pos[valid], weights=amounts[valid], minlength=n).cumsum()
+    options = _candidates(cash, pos, amounts, [greedy, _static_days(cash, pos, threshold)])[valid]
+    item, slot = np.nonzero(options >= 0)
+    days = options[item, slot]
+    m, nx = len(valid), len(item)
+
+    # หน่วยเงินเป็นยอดกลางของรายการ ให้ค่าในเมทริกซ์ไม่ห่างกันมาก
+    unit = float(np.median(np.abs(amounts[valid]))) if m else 1.0
+    unit = unit or 1.0
+    amounts_u, base_u, threshold_u = amounts / unit, base / unit, threshold / unit
+
+    # ลำดับตัวแปร: x (nx), z (n), s (n) ; ต่ำกว่า threshold หนึ่งหน่วยแพงกว่าการเลื่อนทุกรายการจนสุดช่วง
+    delay = (days - pos[valid][item]) * weights[valid][item]
+    penalty = weights[valid].sum() * n + 1.0
+    cost = np.concatenate([delay, np.zeros(n), np.full(n, penalty)])
+
+    assign = coo_array((np.ones(nx), (item, np.arange(nx))), shape=(m, nx + 2 * n))
+    t = np.arange(n)
+    flow = coo_array((
+        np.concatenate([-amounts_u[valid][item], np.ones(n), -np.ones(n - 1)]),
+        (np.concatenate([days, t, t[1:]]), np.concatenate([np.arange(nx), nx + t, nx + t[:-1]])),
+    ), shape=(n, nx + 2 * n))
+    floor = coo_array((np.ones(2 * n), (np.concatenate([t, t]), np.concatenate([nx + t, nx + n + t]))),
+                      shape=(n, nx + 2 * n))
+    constraints = LinearConstraint(
+        vstack([assign, flow, floor]).tocsr(),
+        np.concatenate([np.ones(m), np.zeros(n), threshold_u - base_u]),
+        np.concatenate([np.ones(m), np.zeros(n), np.full(n, np.inf)]),
+    )
+    bounds = Bounds(
+        np.concatenate([np.zeros(nx), np.full(n, -np.inf), np.zeros(n)]),
+        np.concatenate([np.ones(nx), np.full(n, np.inf), np.full(n, np.inf)]),
+    )
+    integrality = np.concatenate([np.ones(nx), np.zeros(2 * n)])
+    result = milp(cost, constraints=constraints, bounds=bounds, integrality=integrality,
+                  options={'time_limit': time_limit})
+    if result.x is None:
+        return greedy, f"MILP ไม่พบคำตอบ ({result.message}) ใช้แผน greedy แทน"
+
+    chosen = np.full(m, -1)
+    x = result.x[:nx]
+    best = pd.Series(x).groupby(item).idxmax().to_numpy()
+    chosen[item[best]] = days[best]
+    new_pos = pos.copy()
+    new_pos[valid] = np.where(chosen >= 0, chosen, pos[valid])
+
+    solved = _shortfall_and_delay(cash, pos, new_pos, amounts, weights, threshold)
+    fallback = _shortfall_and_delay(cash, pos, greedy, amounts, weights, threshold)
+    # ส่วนที่ต่ำกว่า threshold เทียบก่อน (ปัดเป็นสตางค์) แล้วจึงเทียบวันที่เลื่อน
+    if (round(fallback[0], 2), fallback[1]) < (round(solved[0], 2), solved[1]):
+        return greedy, f"MILP ได้แผนที่แย่กว่า greedy ({result.message}) ใช้แผน greedy แทน"
+    if result.status != 0:
+        return new_pos, f"MILP หยุดก่อนพิสูจน์ว่าดีที่สุด ({result.message})"
+    return new_pos, None
+
+
+def plan_deferrals(df, df_merged, threshold=0.0, today=None, mode='greedy', priority=(), time_limit=MILP_TIME_LIMIT):
+    """วางแผนเลื่อนชำระเจ้าหนี้ให้เงินสดสะสมทุกวันไม่ต่ำกว่า threshold
+
+    mode='greedy' : heap ตามวันครบกำหนด จ่ายรายการสำคัญ (priority) ก่อน เร็วสำหรับรายการจำนวนมาก
+                    แต่ไม่รับประกันว่าเลื่อนน้อยที่สุด
+    mode='milp'   : ลดผลรวม น้ำหนัก × วันที่เลื่อน ด้วย scipy.optimize.milp (ต้องติดตั้ง scipy)
+    คืนตารางคอลัมน์ engine.PLAN_COLS เหมือน engine.plan_deferrals() ; ถ้า MILP ไม่ได้คำตอบที่ดีที่สุด
+    (ครบเวลา หรือใช้แผน greedy แทน) ข้อความอยู่ใน plan.attrs['solver']
+    """
+    if mode not in MODES:
+        raise ValueError(f"unknown mode: {mode}")
+    if mode == 'milp' and not milp_available():
+        raise ImportError("โหมด milp ต้องติดตั้ง scipy")
+
+    today = engine._today() if today is None else today
+    df_merged = df_merged.loc[df_merged.index >= today]
+    df_cashout = engine.payables(df, df_merged, today)
+
+    cash = df_merged['เงินสดสะสม'].to_numpy(dtype=float)
+    pos = df_merged.index.get_indexer(df_cashout['วันที่'])
+    amounts = df_cashout['จำนวนเงิน'].to_numpy(dtype=float)
+    weights = _weights(df_cashout['ชื่อเจ้าหนี้'].astype(object), priority)
+
+    status = None
+    if mode == 'milp':
+        new_pos, status = _plan_milp(cash, pos, amounts, weights, threshold, time_limit)
+    else:
+        new_pos = _plan_greedy(cash, pos, amounts, weights, threshold)
+
+    deferred = (pos >= 0) & (new_pos > pos)
+    df_cashout = df_cashout[deferred]
+    plan = pd.DataFrame({
+        'ชื่อเจ้าหนี้': df_cashout['ชื่อเจ้าหนี้'].to_numpy(),
+        'วันที่เดิม': df_cashout['วันที่'].to_numpy(),
+        'วันที่จ่ายใหม่': df_merged.index[new_pos[deferred]],
+        'จำนวนเงินที่เลื่อน': df_cashout['จำนวนเงิน'].to_numpy()
+    }, columns=engine.PLAN_COLS)
+    if status is not None:
+        plan.attrs['solver'] = status
+    return plan
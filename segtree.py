@@ -0,0 +1,109 @@
+import math
+
+
+class MinSegmentTree:
+    """Segment tree ช่วงเพิ่มค่า (range add) / หาค่าต่ำสุด (range min) แบบ lazy ไม่ต้อง push"""
+
+    def __init__(self, values):
+        values = list(values)
+        self.n = len(values)
+        size = 1
+        while size < max(self.n, 1):
+            size *= 2
+        self.size = size
+        self.mn = [math.inf] * (2 * size)
+        self.add = [0.0] * (2 * size)
+        self.mn[size:size + self.n] = [float(v) for v in values]
+        for i in range(size - 1, 0, -1):
+            self.mn[i] = min(self.mn[2 * i], self.mn[2 * i + 1])
+
+    def _pull(self, i):
+        i //= 2
+        while i:
+            self.mn[i] = min(self.mn[2 * i], self.mn[2 * i + 1]) + self.add[i]
+            i //= 2
+
+    def range_add(self, lo, hi, value):
+        """เพิ่ม value ให้ทุกตำแหน่งในช่วง [lo, hi)"""
+        if lo >= hi:
+            return
+        lo += self.size
+        hi += self.size
+        l0, r0 = lo, hi - 1
+        while lo < hi:
+            if lo & 1:
+                self.mn[lo] += value
+                self.add[lo] += value
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                self.mn[hi] += value
+                self.add[hi] += value
+            lo //= 2
+            hi //= 2
+        self._pull(l0)
+        self._pull(r0)
+
+    def range_min(self, lo, hi):
+        """ค่าต่ำสุดในช่วง [lo, hi)"""
+        if lo >= hi:
+            return math.inf
+        return self._range_min(1, 0, self.size, lo, hi)
+
+    def _range_min(self, node, nlo, nhi, lo, hi):
+        if hi <= nlo or nhi <= lo:
+            return math.inf
+        if lo <= nlo and nhi <= hi:
+            return self.mn[node]
+        mid = (nlo + nhi) // 2
+        return self.add[node] + min(
+            self._range_min(2 * node, nlo, mid, lo, hi),
+            self._range_min(2 * node + 1, mid, nhi, lo, hi),
+        )
+
+    def get(self, i):
+        i += self.size
+        value = self.mn[i]
+        i //= 2
+        while i:
+            value += self.add[i]
+            i //= 2
+        return value
+
+    def last_below(self, lo, hi, threshold):
+        """ตำแหน่งสุดท้ายในช่วง [lo, hi) ที่ค่า < threshold, -1 ถ้าไม่มี"""
+        if lo >= hi:
+            return -1
+        return self._last_below(1, 0, self.size, lo, hi, threshold, 0.0)
+
+    def _last_below(self, node, nlo, nhi, lo, hi, threshold, acc):
+        # acc = ผลรวม add ของบรรพบุรุษ ; ไล่ลูกขวาก่อน
+        if hi <= nlo or nhi <= lo or self.mn[node] + acc >= threshold:
+            return -1
+        if node >= self.size:
+            return node - self.size
+        acc += self.add[node]
+        mid = (nlo + nhi) // 2
+        found = self._last_below(2 * node + 1, mid, nhi, lo, hi, threshold, acc)
+        if found < 0:
+            found = self._last_below(2 * node, nlo, mid, lo, hi, threshold, acc)
+        return found
+
+    def first_at_or_below(self, lo, x):
+        """ตำแหน่งแรกที่ >= lo และค่า <= x, -1 ถ้าไม่มี"""
+        if lo >= self.n:
+            return -1
+        return self._first_at_or_below(1, 0, self.size, lo, x, 0.0)
+
+    def _first_at_or_below(self, node, nlo, nhi, lo, x, acc):
+        # acc = ผลรวม add ของบรรพบุรุษ ; mn[node] รวม add ของ node เองแล้ว
+        if nhi <= lo or self.mn[node] + acc > x:
+            return -1
+        if node >= self.size:
+            return node - self.size
+        acc += self.add[node]
+        mid = (nlo + nhi) // 2
+        found = self._first_at_or_below(2 * node, nlo, mid, lo, x, acc)
+        if found < 0:
+            found = self._first_at_or_below(2 * node + 1, mid, nhi, lo, x, acc)
+        return found
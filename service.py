@@ -0,0 +1,212 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Annotated, Literal
+
+import pandas as pd
+import pyarrow as pa
+from fastapi import FastAPI, File, Form, HTTPException, Path, UploadFile
+from fastapi.responses import Response
+
+import batch
+import cache
+import engine
+import pipeline
+import scheduler
+
+
+TABLES = ('ar_ap_days', 'party_stats', 'risk_table', 'daily', 'plan', 'compare', 'shortfalls')
+MODES = ('static', 'balanced', *scheduler.MODES)
+MEDIA_TYPES = {'json': 'application/json', 'arrow': 'application/vnd.apache.arrow.stream'}
+WORKERS = int(os.environ.get('CASHFLOW_SERVICE_WORKERS', min(os.cpu_count() or 1, 4)))
+# จำนวนผลลัพธ์ที่เข้ารหัสแล้วที่เก็บในโปรเซสหลัก และจำนวน ledger ที่แต่ละ worker เปิดค้างไว้
+RESULT_CACHE_SIZE = 256
+WORKER_PIPELINES = 4
+
+Mode = Literal[MODES]
+Table = Literal[TABLES]
+Format = Literal[tuple(MEDIA_TYPES)]
+DatasetKey = Annotated[str, Path(pattern='^[0-9a-f]{64}$', description='SHA-256 ของไฟล์ ledger (cache.file_key)')]
+
+
+# ---- ทำงานใน worker ----
+
+_pipelines = OrderedDict()
+
+
+def _pipeline(key):
+    """SnapshotPipeline ของ dataset (LRU ต่อ worker) คำขอถัดไปของ dataset เดิมใช้ผลขั้นตอนที่จำไว้ต่อได้"""
+    if key in _pipelines:
+        _pipelines.move_to_end(key)
+        return _pipelines[key]
+    df = cache.FrameCache().get(key)
+    if df is None:
+        raise FileNotFoundError(key)
+    _pipelines[key] = pipeline.SnapshotPipeline(df)
+    if len(_pipelines) > WORKER_PIPELINES:
+        _pipelines.popitem(last=False)
+    return _pipelines[key]
+
+
+def ingest(data):
+    """อ่าน ledger (bytes ของ .xlsx) เข้า cache คืน (key, จำนวนแถว)
+
+    worker ทุกตัวอ่าน dataset จาก cache บนดิสก์ ไฟล์ที่เก็บลง cache ไม่ได้จึงถือว่าอัปโหลดไม่สำเร็จ
+    """
+    key = cache.file_key(data)
+    ledger_cache = cache.FrameCache()
+    df = ledger_cache.get(key)
+    if df is None:
+        try:
+            df = engine.load(io.BytesIO(data))
+        except Exception as e:
+            # ไฟล์ที่อ่านไม่ได้ (ไม่ใช่ .xlsx, คอลัมน์ไม่ครบ) เป็นข้อผิดพลาดของคำขอ เหมือนที่ t5.py แสดง st.error
+            raise ValueError(f"อ่านไฟล์ไม่ได้: {e}") from None
+        if not ledger_cache.put(key, df):
+            raise ValueError("เก็บไฟล์ลง cache ไม่ได้: คอลัมน์มีชนิดข้อมูลปนกัน (เช่น ตัวเลขกับข้อความ)")
+    return key, len(df)
+
+
+def _frame(report, name):
+    if name == 'ar_ap_days':
+        return pd.DataFrame([report[name]])
+    return batch._portable(report[name])
+
+
+def encode(df, fmt):
+    """DataFrame เป็น JSON (records, วันที่แบบ ISO) หรือ Arrow IPC stream"""
+    if fmt == 'arrow':
+        table = pa.Table.from_pandas(df)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    if df.index.name is not None:
+        df = df.reset_index()
+    return df.to_json(orient='records', date_format='iso', force_ascii=False).encode()
+
+
+def compute_table(key, today, cash_accum, threshold, mode, name, fmt):
+    report = _pipeline(key).report(today, cash_accum, threshold, mode)
+    return encode(_frame(report, name), fmt)
+
+
+def compute_report(key, today, cash_accum, threshold, mode):
+    """ทุกตารางของ report เป็น JSON เดียว: {"ar_ap_days": {...}, "<ตาราง>": [records], ...}"""
+    report = _pipeline(key).report(today, cash_accum, threshold, mode)
+    parts = [f'"ar_ap_days":{json.dumps(report["ar_ap_days"])}'.encode()]
+    for name in TABLES[1:]:
+        parts.append(f'"{name}":'.encode() + encode(_frame(report, name), 'json'))
+    return b'{' + b','.join(parts) + b'}'
+
+
+# ---- โปรเซสหลัก ----
+
+class ResultCache:
+    """ผลลัพธ์ที่เข้ารหัสแล้วต่อ (dataset, พารามิเตอร์) แบบ LRU ; คำขอที่ซ้ำกับงานที่กำลังคำนวณรอผลเดียวกัน"""
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._done = OrderedDict()
+        self._running = {}
+
+    async def get(self, key, compute):
+        if key in self._done:
+            self._done.move_to_end(key)
+            return self._done[key]
+        if key not in self._running:
+            task = asyncio.ensure_future(compute())
+            task.add_done_callback(lambda task: self._finish(key, task))
+            self._running[key] = task
+        # ผู้เรียกที่ยกเลิก (client ตัดการเชื่อมต่อ) ไม่ยกเลิกงานที่คนอื่นรออยู่
+        return await asyncio.shield(self._running[key])
+
+    def _finish(self, key, task):
+        del self._running[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._done[key] = task.result()
+        if len(self._done) > self.maxsize:
+            self._done.popitem(last=False)
+
+
+def create_app(workers=WORKERS):
+    """แอป FastAPI: ขั้นตอนที่ใช้ CPU ทำใน process pool ขนาด workers ผลลัพธ์เก็บใน ResultCache"""
+
+    @asynccontextmanager
+    async def lifespan(app):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            app.state.pool = pool
+            app.state.results = ResultCache()
+            yield
+
+    app = FastAPI(title='cashflow-management', lifespan=lifespan)
+
+    async def run(fn, *args):
+        try:
+            return await asyncio.get_running_loop().run_in_executor(app.state.pool, fn, *args)
+        except FileNotFoundError:
+            raise HTTPException(404, 'ไม่พบ dataset ใน cache อัปโหลดไฟล์ก่อน') from None
+        except (ValueError, ImportError) as e:
+            raise HTTPException(422, str(e)) from None
+
+    def params(today, cash_accum, threshold, mode):
+        today = pd.Timestamp(today) if today is not None else pd.Timestamp.today().normalize()
+        return today, float(cash_accum), float(threshold), mode
+
+    async def report_body(dataset, today, cash_accum, threshold, mode):
+        args = (dataset, *params(today, cash_accum, threshold, mode))
+        return await app.state.results.get(('report', *args), lambda: run(compute_report, *args))
+
+    @app.post('/datasets')
+    async def upload(file: UploadFile = File(...)):
+        """อัปโหลด ledger (.xlsx) คืน key สำหรับอ้างถึงในคำขอถัดไป"""
+        key, rows = await run(ingest, await file.read())
+        return {'dataset': key, 'rows': rows}
+
+    @app.get('/datasets/{dataset}/report')
+    async def report(dataset: DatasetKey, today: date | None = None, cash_accum: float = 0.0,
+                     threshold: float = 0.0, mode: Mode = 'static'):
+        body = await report_body(dataset, today, cash_accum, threshold, mode)
+        return Response(body, media_type=MEDIA_TYPES['json'])
+
+    @app.get('/datasets/{dataset}/tables/{name}')
+    async def table(name: Table, dataset: DatasetKey, today: date | None = None, cash_accum: float = 0.0,
+                    threshold: float = 0.0, mode: Mode = 'static', format: Format = 'json'):
+        args = (dataset, *params(today, cash_accum, threshold, mode), name, format)
+        body = await app.state.results.get(('table', *args), lambda: run(compute_table, *args))
+        return Response(body, media_type=MEDIA_TYPES[format])
+
+    @app.post('/report')
+    async def upload_report(file: UploadFile = File(...), today: date | None = Form(None), cash_accum: float = Form(0.0),
+                            threshold: float = Form(0.0), mode: Mode = Form('static')):
+        """อัปโหลดแล้วคืน report ในคำขอเดียว ; ไฟล์เดิมซ้ำใช้ cache ทั้ง ledger และผลลัพธ์"""
+        key, _ = await run(ingest, await file.read())
+        body = await report_body(key, today, cash_accum, threshold, mode)
+        return Response(body, media_type=MEDIA_TYPES['json'], headers={'X-Dataset': key})
+
+    return app
+
+
+app = create_app()
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='HTTP service ของการคำนวณใน t5.py (AR/AP days, เกรด, เงินสดสะสม, แผนเลื่อนชำระ)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=WORKERS, help='จำนวนโปรเซสสำหรับขั้นตอนที่ใช้ CPU')
+    args = parser.parse_args(argv)
+    uvicorn.run(create_app(args.workers), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+import engine
+
+
+COLUMNS = [
+    'เริ่ม', 'สิ้นสุด', 'จำนวนวัน', 'วันที่ต่ำสุด', 'เงินสดสะสมต่ำสุด', 'ขาด',
+    'ยอดจ่ายในช่วง', 'ยอดรับในช่วง', 'เจ้าหนี้หลัก', 'ยอดเจ้าหนี้หลัก', 'ลูกหนี้หลัก', 'ยอดลูกหนี้หลัก',
+]
+
+
+def runs(below):
+    """ตำแหน่งเริ่มและสิ้นสุด (รวมปลาย) ของแต่ละช่วงที่ below เป็น True ติดกัน"""
+    edges = np.diff(np.concatenate([[0], np.asarray(below, dtype=np.int8), [0]]))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+
+
+def run_ids(starts, ends, n):
+    """เลขช่วงของแต่ละตำแหน่ง (-1 = ไม่อยู่ในช่วงใด)"""
+    mark = np.zeros(n + 1, dtype=np.int64)
+    mark[starts] += 1
+    mark[ends + 1] -= 1
+    first = np.zeros(n, dtype=np.int64)
+    first[starts] = 1
+    return np.where(mark.cumsum()[:n] > 0, first.cumsum() - 1, -1)
+
+
+def _top(run, names, amounts, n_runs, largest):
+    """ชื่อและยอดรวมของคู่ค้าที่ยอดมากสุด (ตามค่าสัมบูรณ์) ต่อช่วง ; names เป็น Series"""
+    top_name = np.full(n_runs, None, dtype=object)
+    top_amount = np.zeros(n_runs)
+    if len(run):
+        sums = pd.Series(amounts).groupby([run, names.reset_index(drop=True)], observed=True).sum()
+        sums = sums.sort_values(ascending=not largest, kind='stable')
+        best = sums[~sums.index.get_level_values(0).duplicated()]
+        at = best.index.get_level_values(0).to_numpy()
+        top_name[at] = best.index.get_level_values(1).to_numpy()
+        top_amount[at] = best.to_numpy()
+    return top_name, top_amount
+
+
+def _empty(index):
+    """ตารางว่างที่ชนิดคอลัมน์เหมือนผลของ shortfalls() (วันที่ / จำนวนเงิน / จำนวนวัน / ชื่อ)"""
+    dates, amounts = index[:0], np.zeros(0)
+    return pd.DataFrame({
+        'เริ่ม': dates, 'สิ้นสุด': dates, 'จำนวนวัน': np.zeros(0, dtype=np.int64), 'วันที่ต่ำสุด': dates,
+        'เงินสดสะสมต่ำสุด': amounts, 'ขาด': amounts, 'ยอดจ่ายในช่วง': amounts, 'ยอดรับในช่วง': amounts,
+        'เจ้าหนี้หลัก': np.zeros(0, dtype=object), 'ยอดเจ้าหนี้หลัก': amounts,
+        'ลูกหนี้หลัก': np.zeros(0, dtype=object), 'ยอดลูกหนี้หลัก': amounts,
+    }, columns=COLUMNS)
+
+
+def shortfalls(df, cash, threshold=0.0, today=None):
+    """ทุกช่วงที่เงินสดสะสม (cash: Series index = วันที่รายวัน) ต่ำกว่า threshold ตั้งแต่วันนี้
+
+    หาช่วงด้วย run-length encoding บน mask, ค่าต่ำสุดต่อช่วงด้วย reduceat และรายการใน ledger ที่วันที่จ่ายจริง
+    อยู่ในช่วงด้วยเลขช่วงต่อวัน ทั้งหมดเป็นเวลาเชิงเส้น ; ขาด = threshold - เงินสดสะสมต่ำสุด
+    คืนตารางคอลัมน์ COLUMNS หนึ่งแถวต่อช่วง เรียงตามวันเริ่ม
+    """
+    today = engine._today() if today is None else today
+    cash = cash.loc[cash.index >= today]
+    values = cash.to_numpy(dtype=float)
+    starts, ends = runs(values < threshold)
+    if len(starts) == 0:
+        return _empty(cash.index)
+
+    lowest = np.minimum.reduceat(values, starts)
+    day_run = run_ids(starts, ends, len(values))
+    inside = np.flatnonzero(day_run >= 0)
+    at_min = inside[values[inside] == lowest[day_run[inside]]]
+    _, first = np.unique(day_run[at_min], return_index=True)
+    low_day = at_min[first]
+
+    pos = cash.index.get_indexer(df['วันที่จ่ายจริง'])
+    run = np.where(pos >= 0, day_run[pos], -1)
+    rows = np.flatnonzero(run >= 0)
+    run = run[rows]
+    amounts = np.nan_to_num(df['จำนวนเงิน'].to_numpy(dtype=float)[rows])
+    # แปลงชื่อเฉพาะแถวในช่วง (ชื่อเป็น category ได้ จึงไม่แปลงทั้งคอลัมน์)
+    names = df['ชื่อ'].iloc[rows]
+    paying, receiving = amounts < 0, amounts > 0
+
+    n_runs = len(starts)
+    creditor, creditor_amount = _top(run[paying], names[paying], amounts[paying], n_runs, largest=False)
+    debtor, debtor_amount = _top(run[receiving], names[receiving], amounts[receiving], n_runs, largest=True)
+    return pd.DataFrame({
+        'เริ่ม': cash.index[starts],
+        'สิ้นสุด': cash.index[ends],
+        'จำนวนวัน': ends - starts + 1,
+        'วันที่ต่ำสุด': cash.index[low_day],
+        'เงินสดสะสมต่ำสุด': lowest,
+        'ขาด': threshold - lowest,
+        'ยอดจ่ายในช่วง': np.bincount(run, weights=np.where(paying, amounts, 0.0), minlength=n_runs),
+        'ยอดรับในช่วง': np.bincount(run, weights=np.where(receiving, amounts, 0.0), minlength=n_runs),
+        'เจ้าหนี้หลัก': creditor,
+        'ยอดเจ้าหนี้หลัก': creditor_amount,
+        'ลูกหนี้หลัก': debtor,
+        'ยอดลูกหนี้หลัก': debtor_amount,
+    }, columns=COLUMNS)
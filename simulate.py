@@ -0,0 +1,127 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import engine
+
+
+PATHS = 10_000
+HORIZON = 365
+QUANTILES = (5, 50, 95)
+# จำนวน (path × รายการ) ต่อหนึ่งก้อน คุมหน่วยความจำของแต่ละก้อนไว้ราวร้อย MB
+CHUNK_CELLS = 4_000_000
+
+
+def open_receivables(df, today):
+    """ลูกหนี้ที่ยังไม่ได้รับ (วันที่จ่ายจริงหลังวันนี้) และมีวันครบกำหนด"""
+    mask = (df['ประเภท'] == 'ลูกหนี้') & (df['วันที่จ่ายจริง'] > today) & df['วันที่จะได้รับ/จ่าย'].notna()
+    return df.loc[mask, ['วันที่จ่ายจริง', 'วันที่จะได้รับ/จ่าย', 'ชื่อ', 'จำนวนเงิน']]
+
+
+def lateness_ranges(df_filtered, items, today):
+    """diff ในอดีตของลูกหนี้เรียงตาม (ลูกหนี้, diff) และช่วง [lo, hi) ของแต่ละรายการใน items
+
+    ช่วงของรายการคือ diff ของลูกหนี้รายนั้นที่ทำให้วันรับอยู่หลังวันนี้ (ยังไม่ได้รับ)
+    ลูกหนี้ที่ไม่มีประวัติใช้ diff ของลูกหนี้ทุกราย
+    """
+    dfar = df_filtered[(df_filtered['ประเภท'] == 'ลูกหนี้') & df_filtered['diff'].notna()]
+    codes, names = engine._by_name(dfar)
+    diff = dfar['diff'].to_numpy(dtype=np.int64)
+    known = codes >= 0
+
+    # กลุ่มสุดท้าย (len(names)) คือทุกราย
+    group = np.concatenate([codes[known], np.full(len(diff), len(names))])
+    diff = np.concatenate([diff[known], diff])
+    order = np.lexsort((diff, group))
+    group, values = group[order], diff[order]
+
+    item_group = names.get_indexer(items['ชื่อ'].astype(object))
+    item_group = np.where(item_group >= 0, item_group, len(names))
+
+    # diff ต้อง > วันนี้ - วันครบกำหนด ; ค้นหาใน key (กลุ่ม, diff) ที่เรียงแล้ว
+    overdue = (today - items['วันที่จะได้รับ/จ่าย']).dt.days.to_numpy(dtype=np.int64)
+    base = values.min() if len(values) else 0
+    span = int(values.max() - base + 2) if len(values) else 2
+    keys = group * span + (values - base)
+    floor = np.clip(overdue + 1 - base, 0, span - 1)
+    lo = np.searchsorted(keys, item_group * span + floor, side='left')
+    hi = np.searchsorted(keys, (item_group + 1) * span, side='left')
+    return values, lo, hi
+
+
+def _paths(seed, n_paths, values, lo, hi, due_pos, amounts, base):
+    """เงินสดสะสม (n_paths × วัน) ทีละก้อนไม่เกิน CHUNK_CELLS สุ่ม diff ของแต่ละรายการจาก values[lo:hi]"""
+    rng = np.random.default_rng(seed)
+    size = max(1, CHUNK_CELLS // max(len(amounts), 1))
+    return np.concatenate([
+        _chunk(rng, min(size, n_paths - start), values, lo, hi, due_pos, amounts, base)
+        for start in range(0, n_paths, size)
+    ])
+
+
+def _chunk(rng, n_paths, values, lo, hi, due_pos, amounts, base):
+    horizon = len(base)
+    count = hi - lo
+
+    pick = lo + (rng.random((n_paths, len(amounts))) * count).astype(np.int64)
+    diff = values[np.minimum(pick, max(len(values) - 1, 0))] if len(values) else np.zeros_like(pick)
+    # ไม่มีประวัติที่ช้ากว่านี้แล้ว ถือว่าได้รับพรุ่งนี้ ; เลยช่วงที่จำลองตัดทิ้ง (วัน horizon)
+    day = np.where(count > 0, due_pos + diff, 1)
+    day = np.clip(day, 1, horizon)
+
+    rows = np.arange(n_paths)[:, None] * (horizon + 1)
+    received = np.bincount(
+        (rows + day).ravel(),
+        weights=np.broadcast_to(amounts, day.shape).ravel(),
+        minlength=n_paths * (horizon + 1),
+    ).reshape(n_paths, horizon + 1)[:, :horizon]
+    return (base + received.cumsum(axis=1)).astype(np.float32)
+
+
+def simulate(df, df_merged, df_filtered, today, threshold=0.0, paths=PATHS, horizon=HORIZON, seed=0, workers=1):
+    """จำลองเงินสดสะสมตั้งแต่วันนี้ paths รอบ โดยเลื่อนวันรับของลูกหนี้ที่ยังไม่ได้รับตาม diff ในอดีตของแต่ละราย
+
+    วันรับ = วันครบกำหนด + diff ที่สุ่มจากประวัติของลูกหนี้รายนั้น รายการอื่นและเจ้าหนี้อยู่วันเดิม
+    คืน DataFrame (index = วันที่): เงินสดสะสม (แผนเดิม), P5 / P50 / P95 และ breach_pct (% ของรอบที่ต่ำกว่า threshold)
+    """
+    days = df_merged.loc[df_merged.index >= today].index[:horizon]
+    cash = df_merged['เงินสดสะสม'].reindex(days).to_numpy(dtype=float)
+    if len(days) == 0:
+        return pd.DataFrame(columns=['เงินสดสะสม', *(f'P{q}' for q in QUANTILES), 'breach_pct'])
+
+    items = open_receivables(df, today)
+    values, lo, hi = lateness_ranges(df_filtered, items, today)
+    amounts = items['จำนวนเงิน'].to_numpy(dtype=float)
+    amounts = np.nan_to_num(amounts)
+
+    # แผนเดิมหักรายการที่จะสุ่มออก เหลือส่วนที่ไม่เปลี่ยน (ตำแหน่ง 0 = วันนี้)
+    scheduled = days.get_indexer(items['วันที่จ่ายจริง'])
+    inside = scheduled >= 0
+    base = cash - np.bincount(scheduled[inside], weights=amounts[inside], minlength=len(days)).cumsum()
+    due_pos = (items['วันที่จะได้รับ/จ่าย'] - days[0]).dt.days.to_numpy(dtype=np.int64)
+
+    # แบ่งรอบให้แต่ละโปรเซสเท่า ๆ กัน ; ผลขึ้นกับ seed และ workers
+    workers = max(1, min(workers, paths))
+    sizes = np.diff(np.linspace(0, paths, workers + 1).astype(int))
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    args = [(s, n, values, lo, hi, due_pos, amounts, base) for s, n in zip(seeds, sizes)]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            sims = np.concatenate(list(pool.map(_paths, *zip(*args))))
+    else:
+        sims = _paths(*args[0])
+
+    bands = np.percentile(sims, QUANTILES, axis=0)
+    result = pd.DataFrame({'เงินสดสะสม': cash}, index=days)
+    for q, band in zip(QUANTILES, bands):
+        result[f'P{q}'] = band.astype(float)
+    result['breach_pct'] = ((sims < threshold).mean(axis=0) * 100).round(2)
+    return result
+
+
+def default_workers(paths):
+    """ใช้หลายโปรเซสเฉพาะเมื่อจำนวนรอบมากพอคุ้มค่าเริ่มโปรเซส"""
+    return min(os.cpu_count() or 1, 8) if paths >= 50_000 else 1
@@ -0,0 +1,386 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import cache
+import engine
+
+
+# เปลี่ยนเมื่อรูปแบบไฟล์ใน store หรือยอดรวมที่เก็บไว้เปลี่ยน (ยอดรวมเดิมจะถูกคำนวณใหม่ทั้งหมด)
+STORE_VERSION = 1
+
+DEFAULT_DIR = cache.DEFAULT_DIR / 'stores'
+ID_COL = 'row_id'
+NO_DATE = 'none'
+
+AR_SUMS = ['ar_rows', 'ar_dur_sum', 'ar_dur_n', 'ar_diff_sum', 'ar_diff_n', 'ar_late', 'ar_amount']
+AP_SUMS = ['ap_rows', 'ap_dur_sum', 'ap_dur_n', 'ap_diff_sum', 'ap_diff_n', 'ap_term_sum', 'ap_term_n', 'ap_amount']
+PARTY_COUNTS = ['ar_rows', 'ap_rows']
+
+
+def row_ids(df):
+    """hash ของค่าใน REQUIRED_COLS ต่อแถว แถวที่เหมือนกันทุกค่าแยกกันด้วยลำดับที่พบ"""
+    values = pd.DataFrame({
+        col: (
+            df[col].to_numpy('datetime64[ns]').view(np.int64) if col in engine.DATE_COLS
+            else df[col].astype(float) if col == 'จำนวนเงิน'
+            else df[col]
+        )
+        for col in engine.REQUIRED_COLS
+    })
+    hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    # ลำดับที่ของแถวในกลุ่ม hash เดียวกัน จากการเรียงแบบ stable
+    order = np.argsort(hashes, kind='stable')
+    ranks = np.arange(len(order))
+    starts = np.r_[True, hashes[order][1:] != hashes[order][:-1]]
+    seen = np.empty(len(order), dtype=np.int64)
+    seen[order] = ranks - np.maximum.accumulate(np.where(starts, ranks, 0))
+    return pd.util.hash_pandas_object(pd.DataFrame({'h': hashes, 'k': seen}), index=False).to_numpy()
+
+
+def months(dates):
+    """{ชื่อ partition: ตำแหน่งแถว} ; partition คือ YYYY-MM ของวันที่จ่ายจริง หรือ 'none' ถ้าไม่มีวันที่"""
+    month = pd.Series(dates).to_numpy('datetime64[ns]').astype('datetime64[M]').view(np.int64)
+    order = np.argsort(month, kind='stable')
+    uniques, starts = np.unique(month[order], return_index=True)
+    labels = uniques.view('datetime64[M]')
+    labels = np.where(np.isnat(labels), NO_DATE, labels.astype(str))
+    return dict(zip(labels, np.split(order, starts[1:])))
+
+
+def _window(df, lo, hi):
+    """แถวที่วันที่จ่ายจริงอยู่ในช่วง (lo, hi] ; lo=None คือไม่มีขอบล่าง"""
+    paid = df['วันที่จ่ายจริง']
+    mask = paid <= hi
+    if lo is not None:
+        mask &= paid > lo
+    return df.loc[mask]
+
+
+def party_rows(df):
+    """ส่วนของแต่ละแถวในยอดรวมของ party_sums() (คอลัมน์ AR_SUMS + AP_SUMS, index เดียวกับ df)"""
+    is_ar = (df['ประเภท'] == 'ลูกหนี้').to_numpy()
+    is_ap = (df['ประเภท'] == 'เจ้าหนี้').to_numpy()
+    duration, term, diff = (df[col].to_numpy(dtype=float) for col in engine.HIDDEN_COLS)
+    amount = np.nan_to_num(df['จำนวนเงิน'].to_numpy(dtype=float))
+
+    def side(mask, prefix):
+        sums = {
+            f'{prefix}_rows': mask,
+            f'{prefix}_dur_sum': np.where(mask, np.nan_to_num(duration), 0),
+            f'{prefix}_dur_n': mask & ~np.isnan(duration),
+            f'{prefix}_diff_sum': np.where(mask, np.nan_to_num(diff), 0),
+            f'{prefix}_diff_n': mask & ~np.isnan(diff),
+            f'{prefix}_amount': np.where(mask, amount, 0),
+        }
+        if prefix == 'ar':
+            sums['ar_late'] = mask & (diff > 0)
+        else:
+            sums['ap_term_sum'] = np.where(mask, np.nan_to_num(term), 0)
+            sums['ap_term_n'] = mask & ~np.isnan(term)
+        return sums
+
+    return pd.DataFrame({**side(is_ar, 'ar'), **side(is_ap, 'ap')}, index=df.index).astype(float)[AR_SUMS + AP_SUMS]
+
+
+def party_sums(df):
+    """ยอดรวมต่อชื่อที่บวก/ลบกันได้ สำหรับ debtor_table / creditor_table / ar_ap_days (รวมชื่อว่างเป็น NaN)"""
+    names = df['ชื่อ'].astype(object).to_numpy()
+    sums = party_rows(df).groupby(names, dropna=False).sum()
+    sums.index = pd.Index(sums.index, dtype=object, name='ชื่อ')
+    return sums
+
+
+def daily_sums(df):
+    """ยอดต่อวันจ่ายจริง (ทุกแถว ไม่ขึ้นกับวันนี้) และยอดลูกหนี้ต่อ (วัน, ชื่อ) สำหรับ total_riskamt"""
+    df = df[df['วันที่จ่ายจริง'].notna()]
+    amount = df['จำนวนเงิน'].to_numpy(dtype=float)
+    is_ar = (df['ประเภท'] == 'ลูกหนี้').to_numpy()
+    paid = df['วันที่จ่ายจริง'].to_numpy()
+
+    daily = pd.DataFrame({
+        'rows': 1.0,
+        'cash_in': np.where(amount > 0, amount, 0),
+        'cash_out': np.where(amount < 0, amount, 0),
+        'ar_amount': np.where(is_ar, np.nan_to_num(amount), 0),
+    }).groupby(paid).sum()
+    daily.index.name = 'วันที่จ่ายจริง'
+
+    debtors = df.loc[is_ar & df['ชื่อ'].notna().to_numpy()]
+    by_name = (
+        pd.DataFrame({
+            'วันที่จ่ายจริง': debtors['วันที่จ่ายจริง'].to_numpy(),
+            'ชื่อ': debtors['ชื่อ'].astype(object).to_numpy(),
+            'rows': 1.0,
+            'amount': np.nan_to_num(debtors['จำนวนเงิน'].to_numpy(dtype=float)),
+        })
+        .groupby(['วันที่จ่ายจริง', 'ชื่อ']).sum()
+    )
+    return daily, by_name
+
+
+def _add(total, delta, sign, counts):
+    """total + sign * delta ตาม index แล้วตัดแถวที่ไม่เหลือรายการในคอลัมน์ counts"""
+    if delta.empty:
+        return total
+    total = total.add(sign * delta, fill_value=0)
+    return total[(total[counts].round() > 0).any(axis=1)]
+
+
+def ar_ap_days(total):
+    """engine.ar_ap_days() จากผลรวมของ party_sums() ทุกชื่อ"""
+    result = {'ar_days': None, 'ar_ontime': None, 'ap_days': None, 'ap_ontime': None}
+    for side in ('ar', 'ap'):
+        if total[f'{side}_rows'] > 0:
+            result[f'{side}_days'] = int(np.round(total[f'{side}_dur_sum'] / total[f'{side}_dur_n']))
+            result[f'{side}_ontime'] = int(np.round(total[f'{side}_diff_sum'] / total[f'{side}_diff_n']))
+    return result
+
+
+class LedgerStats:
+    """ยอดรวมที่ปรับทีละส่วนได้ของ ledger ใน store ณ วัน as_of
+
+    party        : party_sums() ของรายการที่จ่ายจริงแล้วถึง as_of (ฐานของ late_pct)
+    daily        : ยอดต่อวันจ่ายจริงของทุกรายการ
+    debtor_daily : ยอดลูกหนี้ต่อ (วัน, ชื่อ)
+    """
+
+    def __init__(self, party, daily, debtor_daily, as_of):
+        self.party = party
+        self.daily = daily
+        self.debtor_daily = debtor_daily
+        self.as_of = pd.Timestamp(as_of)
+
+    @classmethod
+    def build(cls, df, as_of):
+        as_of = pd.Timestamp(as_of)
+        return cls(party_sums(_window(df, None, as_of)), *daily_sums(df), as_of)
+
+    def apply(self, added, removed, entered=None, left=None, as_of=None):
+        """ปรับยอดด้วยแถวที่เพิ่ม/ลบ และแถวที่ข้ามวัน as_of เมื่อ as_of เปลี่ยน (entered / left)"""
+        old, new = self.as_of, self.as_of if as_of is None else pd.Timestamp(as_of)
+        for rows, sign in ((added, 1), (removed, -1)):
+            if rows is None or rows.empty:
+                continue
+            daily, by_name = daily_sums(rows)
+            self.daily = _add(self.daily, daily, sign, ['rows'])
+            self.debtor_daily = _add(self.debtor_daily, by_name, sign, ['rows'])
+        for rows, sign, as_of in ((added, 1, new), (removed, -1, old)):
+            if rows is not None and not rows.empty:
+                self.party = _add(self.party, party_sums(_window(rows, None, as_of)), sign, PARTY_COUNTS)
+        for rows, sign in ((entered, 1), (left, -1)):
+            if rows is not None and not rows.empty:
+                self.party = _add(self.party, party_sums(rows), sign, PARTY_COUNTS)
+        self.as_of = new
+        return self
+
+    def _known(self):
+        return self.party[self.party.index.notna()].sort_index()
+
+    def debtor_table(self):
+        """เท่ากับ engine.debtor_table(engine.filter_actual(df, as_of))"""
+        sums = self._known()
+        sums = sums[sums['ar_rows'].round() > 0]
+        table = pd.DataFrame({
+            'avg_duration': sums['ar_dur_sum'] / sums['ar_dur_n'].where(sums['ar_dur_n'] > 0),
+            'total_amount': sums['ar_amount'],
+            'late_freq': sums['ar_late'].round().astype(np.int64),
+            'total_count': sums['ar_diff_n'].round().astype(np.int64),
+        })
+        table.index.name = 'ชื่อ'
+        return engine.late_grades(table)
+
+    def creditor_table(self):
+        """เท่ากับ engine.creditor_table(engine.filter_actual(df, as_of))"""
+        sums = self._known()
+        sums = sums[sums['ap_rows'].round() > 0]
+        table = pd.DataFrame({
+            'ap_avg_term': sums['ap_term_sum'] / sums['ap_term_n'].where(sums['ap_term_n'] > 0),
+            'ap_total_amount': sums['ap_amount'],
+        })
+        table.index.name = 'ชื่อ'
+        return table
+
+    def ar_ap_days(self):
+        """เท่ากับ engine.ar_ap_days(engine.filter_actual(df, as_of))"""
+        return ar_ap_days(self.party.sum())
+
+    def daily_flows(self, late_pct):
+        """เท่ากับ engine.daily_flows(df, late_pct) แต่ใช้ยอดรายวันที่เก็บไว้แทนการ groupby ทั้ง ledger"""
+        # ค้นหา % ต่อชื่อที่ไม่ซ้ำครั้งเดียว แล้วกระจายตามรหัสของ MultiIndex
+        level = self.debtor_daily.index.names.index('ชื่อ')
+        names, codes = self.debtor_daily.index.levels[level], self.debtor_daily.index.codes[level]
+        pct = late_pct['% จ่ายเกินเวลา'].reindex(names).to_numpy(dtype=float)[codes]
+        riskamt = pd.Series(pct / 100 * self.debtor_daily['amount'].to_numpy(), index=self.debtor_daily.index)
+        riskamt = riskamt.groupby(level='วันที่จ่ายจริง').sum()
+
+        risk = pd.DataFrame({
+            'total_riskamt': riskamt.reindex(self.daily.index, fill_value=0),
+            'total_amount': self.daily['ar_amount'],
+        })
+        return engine.daily_frame(self.daily[['cash_in', 'cash_out']], risk)
+
+
+class LedgerStore:
+    """ledger ที่เก็บถาวรเป็น Parquet แยกไฟล์ตามเดือนของวันที่จ่ายจริง แต่ละแถวมี row_id
+
+    upsert() เขียนใหม่เฉพาะเดือนที่มีแถวเพิ่ม/หาย และ update() ปรับ LedgerStats เฉพาะส่วนที่เปลี่ยน
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.ledger_dir = self.directory / 'ledger'
+        self.stats_dir = self.directory / 'stats'
+        self.ledger_dir.mkdir(parents=True, exist_ok=True)
+
+    def partitions(self):
+        return sorted(p.stem for p in self.ledger_dir.glob('*.parquet'))
+
+    def _path(self, part):
+        return self.ledger_dir / f"{part}.parquet"
+
+    def _ids(self, part):
+        try:
+            return pq.read_table(self._path(part), columns=[ID_COL]).column(0).to_numpy()
+        except FileNotFoundError:
+            return np.array([], dtype=np.uint64)
+
+    def read(self, parts=None):
+        """แถวใน store (มีคอลัมน์ row_id) เฉพาะ partition ที่ระบุ"""
+        parts = self.partitions() if parts is None else [p for p in parts if self._path(p).exists()]
+        if not parts:
+            return None
+        frames = [pq.read_table(self._path(p), memory_map=True).to_pandas() for p in parts]
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        return engine.compact(df)
+
+    def load(self):
+        """ledger ทั้งหมดใน store แบบเดียวกับ engine.load()
+
+        แถวเรียงตาม partition (เดือน) ไม่ใช่ลำดับในไฟล์ที่อัปโหลด ; ทุกขั้นตอนใน pipeline ไม่ขึ้นกับลำดับแถว
+        (แผนเลื่อนชำระเรียงเจ้าหนี้ด้วย engine.payables()) ผลจึงเท่ากับ ledger ที่อัปโหลด
+        """
+        df = self.read()
+        return None if df is None else df.drop(columns=ID_COL)
+
+    def between(self, lo, hi):
+        """แถวที่วันที่จ่ายจริงอยู่ในช่วง (lo, hi] อ่านเฉพาะเดือนที่เกี่ยวข้อง"""
+        wanted = pd.period_range(lo, hi, freq='M').strftime('%Y-%m')
+        df = self.read(wanted)
+        return None if df is None else _window(df, lo, hi)
+
+    def _write(self, part, df):
+        path = self._path(part)
+        if df.empty:
+            path.unlink(missing_ok=True)
+            return
+        tmp = path.with_suffix('.tmp')
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+
+    def upsert(self, df):
+        """แทนที่ ledger ใน store ด้วย df (ledger ทั้งประวัติที่ engine.prepare() แล้ว)
+
+        คืน dict: added / removed (แถวที่เพิ่ม/หาย), names (ชื่อที่เปลี่ยน),
+        first_date (วันที่จ่ายจริงแรกที่ได้รับผล) และ partitions (เดือนที่เขียนใหม่)
+        แถวที่แก้ค่าใดค่าหนึ่งนับเป็นลบแถวเดิมและเพิ่มแถวใหม่
+        """
+        df = df.assign(**{ID_COL: row_ids(df)})
+        groups = months(df['วันที่จ่ายจริง'])
+
+        added, removed, written = [], [], []
+        for part in sorted(set(groups) | set(self.partitions())):
+            new = df.iloc[groups[part]] if part in groups else df.iloc[:0]
+            old_ids = self._ids(part)
+            new_ids = new[ID_COL].to_numpy()
+            if len(old_ids) == len(new_ids) and np.array_equal(np.sort(old_ids), np.sort(new_ids)):
+                continue
+
+            gone = ~np.isin(old_ids, new_ids)
+            if gone.any():
+                old = self.read([part])
+                removed.append(old[gone])
+            added.append(new[~np.isin(new_ids, old_ids)])
+            self._write(part, new)
+            written.append(part)
+
+        added = engine.compact(pd.concat(added, ignore_index=True)) if added else df.iloc[:0]
+        removed = engine.compact(pd.concat(removed, ignore_index=True)) if removed else df.iloc[:0]
+        changed = pd.concat([added[['วันที่จ่ายจริง', 'ชื่อ']], removed[['วันที่จ่ายจริง', 'ชื่อ']]])
+        return {
+            'added': added,
+            'removed': removed,
+            'names': pd.Index(changed['ชื่อ'].dropna().astype(object).unique(), name='ชื่อ').sort_values(),
+            'first_date': changed['วันที่จ่ายจริง'].min() if len(changed) else None,
+            'partitions': written,
+        }
+
+    def stats(self):
+        """LedgerStats ที่บันทึกไว้ หรือ None ถ้ายังไม่มี / version ไม่ตรง"""
+        try:
+            meta = json.loads((self.stats_dir / 'meta.json').read_text())
+            if meta['version'] != STORE_VERSION:
+                return None
+            frames = [pd.read_parquet(self.stats_dir / f"{name}.parquet") for name in ('party', 'daily', 'debtor_daily')]
+        except (FileNotFoundError, KeyError, ValueError, pa.ArrowException):
+            return None
+        frames[0].index = pd.Index(frames[0].index, dtype=object, name='ชื่อ')
+        return LedgerStats(*frames, meta['as_of'])
+
+    def save_stats(self, stats):
+        self.stats_dir.mkdir(parents=True, exist_ok=True)
+        for name in ('party', 'daily', 'debtor_daily'):
+            getattr(stats, name).to_parquet(self.stats_dir / f"{name}.parquet")
+        meta = {'version': STORE_VERSION, 'as_of': stats.as_of.isoformat()}
+        (self.stats_dir / 'meta.json').write_text(json.dumps(meta))
+
+    def update(self, df, as_of):
+        """upsert() แล้วปรับ LedgerStats เฉพาะแถวที่เปลี่ยนและแถวที่ข้ามวัน as_of ; คืน (changes, stats)"""
+        as_of = pd.Timestamp(as_of)
+        stats = self.stats()
+        changes = self.upsert(df)
+
+        if stats is None:
+            stats = LedgerStats.build(self.read(), as_of)
+        else:
+            entered = left = None
+            if as_of != stats.as_of:
+                crossed = self.between(min(as_of, stats.as_of), max(as_of, stats.as_of))
+                if crossed is not None:
+                    # แถวที่เพิ่งเพิ่มถูกนับด้วย as_of ใหม่ใน apply() แล้ว
+                    crossed = crossed[~np.isin(crossed[ID_COL], changes['added'][ID_COL])]
+                if as_of > stats.as_of:
+                    entered = crossed
+                else:
+                    left = crossed
+            stats.apply(changes['added'], changes['removed'], entered, left, as_of)
+
+        self.save_stats(stats)
+        return changes, stats
+
+
+def open_store(name='default', root=DEFAULT_DIR):
+    return LedgerStore(Path(root) / name)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='รวม ledger ใหม่เข้ากับ store เดิม และแสดงสิ่งที่เปลี่ยน')
+    parser.add_argument('path', help='ไฟล์ .xlsx (ประวัติทั้งหมด)')
+    parser.add_argument('--store', default='default', help='ชื่อ store (ไดเรกทอรีใต้ DEFAULT_DIR) หรือ path')
+    parser.add_argument('--as-of', help='วันที่ใช้เป็นวันนี้ (YYYY-MM-DD)')
+    args = parser.parse_args()
+
+    store_dir = Path(args.store) if os.sep in args.store else DEFAULT_DIR / args.store
+    as_of = pd.Timestamp(args.as_of) if args.as_of else pd.Timestamp.today().normalize()
+    changes, stats = LedgerStore(store_dir).update(cache.load(args.path), as_of)
+    print(f"เพิ่ม {len(changes['added']):,} แถว, ลบ {len(changes['removed']):,} แถว, "
+          f"คู่ค้าที่เปลี่ยน {len(changes['names']):,} ราย, "
+          f"วันที่แรกที่ได้รับผล {changes['first_date'] and changes['first_date'].date()}, "
+          f"เขียนใหม่ {len(changes['partitions'])} เดือน")
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+import engine
+
+
+SIZES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+EXCEL_MAX_ROWS = 1_048_575
+
+TERMS = np.array([7, 15, 30, 45, 60, 90])
+TERM_WEIGHTS = np.array([0.05, 0.2, 0.4, 0.15, 0.15, 0.05])
+
+
+def generate(n_rows, seed=0, n_names=None, start='2024-01-01', days=730, ar_share=0.6):
+    """ledger สังเคราะห์ตาม engine.REQUIRED_COLS
+
+    - ลูกหนี้/เจ้าหนี้ ตาม ar_share (คู่ค้าแต่ละรายเป็นฝ่ายเดียว)
+    - วันวางบิลกระจายใน days วัน, เครดิตเทอม 7–90 วัน
+    - ความช้าต่อรายสุ่มจาก gamma ทำให้บางรายจ่ายช้าประจำ บางรายตรงเวลา
+    - ยอดเงินแบบ lognormal, ลูกหนี้เป็นบวก เจ้าหนี้เป็นลบ
+    """
+    rng = np.random.default_rng(seed)
+    n_names = n_names or int(min(50_000, max(20, n_rows // 50)))
+
+    is_ar = rng.random(n_names) < ar_share
+    # ค่าเฉลี่ยความช้า (วัน) ต่อราย: ส่วนใหญ่ใกล้ 0 บางรายช้ามาก
+    late_mean = rng.gamma(shape=0.8, scale=6.0, size=n_names) - 2.0
+    size_scale = rng.lognormal(mean=10.5, sigma=1.0, size=n_names)
+
+    who = rng.zipf(1.3, size=n_rows) % n_names
+    base = np.datetime64(start, 'D')
+    bill = base + rng.integers(0, days, n_rows).astype('timedelta64[D]')
+    terms = rng.choice(TERMS, size=n_rows, p=TERM_WEIGHTS)
+    due = bill + terms.astype('timedelta64[D]')
+    lateness = np.rint(rng.normal(late_mean[who], 3.0)).astype(np.int64)
+    paid = due + lateness.astype('timedelta64[D]')
+    paid = np.maximum(paid, bill)
+
+    amount = np.round(size_scale[who] * rng.lognormal(0.0, 0.6, n_rows), -1)
+    amount = np.where(is_ar[who], amount, -amount)
+
+    names = pd.Categorical.from_codes(
+        who, categories=[f'บริษัท ตัวอย่าง {i:05d} จำกัด' for i in range(n_names)]
+    )
+    types = pd.Categorical.from_codes(is_ar[who].astype(np.int8) ^ 1, categories=['ลูกหนี้', 'เจ้าหนี้'])
+
+    return pd.DataFrame({
+        'วันที่จ่ายจริง': paid.astype('datetime64[ns]'),
+        'วันวางบิล': bill.astype('datetime64[ns]'),
+        'วันที่จะได้รับ/จ่าย': due.astype('datetime64[ns]'),
+        'ประเภท': types,
+        'ชื่อ': names,
+        'จำนวนเงิน': amount,
+    })[engine.REQUIRED_COLS]
+
+
+def as_of(start='2024-01-01', days=730, share=0.75):
+    """วันที่ใช้เป็น 'วันนี้' ของ ledger สังเคราะห์ ให้มีทั้งข้อมูลจริงและคาดการณ์"""
+    return pd.Timestamp(start) + pd.Timedelta(days=int(days * share))
+
+
+def write_workbook(df, path):
+    if len(df) > EXCEL_MAX_ROWS:
+        raise ValueError(f"Excel รองรับได้ไม่เกิน {EXCEL_MAX_ROWS:,} แถว")
+    df.to_excel(path, index=False)
+    return path
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='สร้าง ledger สังเคราะห์เป็นไฟล์ .xlsx')
+    parser.add_argument('size', choices=list(SIZES))
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    write_workbook(generate(SIZES[args.size], seed=args.seed), args.path)
@@ -4,6 +4,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import plotly.graph_objects as go
 
+import engine
+
 
 st.set_page_config(
     page_title="CASHFLOW MANAGEMENT",
@@ -34,7 +36,7 @@ if uploaded_file is None:
     st.stop()
 
 # ถ้ามีไฟล์แล้ว จะมาถึงตรงนี้เท่านั้น
-df = pd.read_excel(uploaded_file)
+df = engine.read_excel(uploaded_file)
 try:
     # แปลงวันที่
     df['วันที่จ่ายจริง']       = pd.to_datetime(df['วันที่จ่ายจริง'], format='mixed')
@@ -1,304 +1,402 @@
-import streamlit as st 
-import pandas as pd
-import matplotlib.pyplot as plt
-import plotly.graph_objects as go
-
-
-st.set_page_config(page_title="CASHFLOW MANAGEMENT", layout="wide")
-
-
-col1, col2 = st.columns([9, 1])
-with col2:
-    st.image("logo.png", width=150)
-
-
-col1, col2, col3 = st.columns([1, 5, 1])
-with col2:
-    st.markdown("<h1 style='text-align: center; margin: 0;'>CASHFLOW MANAGEMENT</h1>", unsafe_allow_html=True)
-
-@st.cache_data(show_spinner=False)
-def load_excel(file):
-    return pd.read_excel(file)
-
-required_cols = [
-    'วันที่จ่ายจริง', 'วันวางบิล', 'วันที่จะได้รับ/จ่าย',
-    'ประเภท', 'ชื่อ', 'จำนวนเงิน'
-]
-
-uploaded_file = st.file_uploader("Choose an Excel file", type=['xlsx'])
-if uploaded_file is None:
-    st.info("กรุณาอัปโหลดไฟล์ก่อน")
-    st.stop()
-
-try:
-    df = load_excel(uploaded_file)
-except Exception:
-    st.error("ไม่สามารถเปิดไฟล์ได้")
-    st.stop()
-
-missing = [c for c in required_cols if c not in df.columns]
-if missing:
-    st.error(f"คอลัมน์หายไป: {', '.join(missing)}")
-    st.stop()
-
-try:
-    df['วันที่จ่ายจริง']       = pd.to_datetime(df['วันที่จ่ายจริง'], format='mixed')
-    df['วันวางบิล']           = pd.to_datetime(df['วันวางบิล'], format='mixed')
-    df['วันที่จะได้รับ/จ่าย']   = pd.to_datetime(df['วันที่จะได้รับ/จ่าย'], format='mixed')
-
-    df['ระยะเวลา']           = (df['วันที่จ่ายจริง'] - df['วันวางบิล']).dt.days
-    df['ระยะเวลาที่กำหนด']   = (df['วันที่จะได้รับ/จ่าย'] - df['วันวางบิล']).dt.days
-    df['diff']               = df['ระยะเวลา'] - df['ระยะเวลาที่กำหนด']
-
-    cols_to_hide = ['ระยะเวลา', 'ระยะเวลาที่กำหนด', 'diff']
-    df_display = df.drop(columns=cols_to_hide, errors='ignore')
-    st.dataframe(df_display, use_container_width=True)
-except Exception:
-    st.error("รูปแบบไม่ถูกต้อง")
-    st.stop()
-
-st.title('AR & AP DAYS')
-
-start_date = df['วันที่จ่ายจริง'].min()
-end_date   = pd.Timestamp.today().normalize()
-
-mask = (df['วันที่จ่ายจริง'] >= start_date) & (df['วันที่จ่ายจริง'] <= end_date)
-df_filtered = df.loc[mask].copy()
-
-df_ar = df_filtered[df_filtered['ประเภท'] == 'ลูกหนี้']
-df_ap = df_filtered[df_filtered['ประเภท'] == 'เจ้าหนี้']
-
-if not df_ar.empty:
-    dfarday    = int(df_ar['ระยะเวลา'].mean().round())
-    dfarontime = int(df_ar['diff'].mean().round())
-if not df_ap.empty:
-    dfapday    = int(df_ap['ระยะเวลา'].mean().round())
-    dfapontime = int(df_ap['diff'].mean().round())
-
-col0, col1, col2 = st.columns(3)
-with col0:
-    st.metric("วันที่เริ่มต้นข้อมูล", start_date.strftime("%Y-%m-%d"))
-with col1:
-    st.metric("วันที่สิ้นสุด", end_date.strftime("%Y-%m-%d"))
-with col2:
-    st.metric("ระยะเวลาข้อมูลที่ใช้ในการคำนวณ", f"{(end_date - start_date).days} วัน")
-
-cols = st.columns(2)
-with cols[0]:
-    if not df_ar.empty:
-        st.metric("AR DAYS", f"{dfarday} วัน", delta=f"{dfarontime:+d} วัน(ช้า/เร็ว)", delta_color="inverse")
-with cols[1]:
-    if not df_ap.empty:
-        st.metric("AP DAYS", f"{dfapday} วัน", delta=f"{dfapontime:+d} วัน(ช้า/เร็ว)", delta_color="normal")
-
-dfar = df_filtered[df_filtered['ประเภท'] == 'ลูกหนี้']
-
-avg_duration = (
-    dfar.groupby('ชื่อ')['ระยะเวลา'].mean().round(0)
-    .sort_values(ascending=False).rename('avg_duration').to_frame()
-)
-
-total_amount = (
-    dfar.groupby('ชื่อ')['จำนวนเงิน'].sum().round(0)
-    .sort_values(ascending=False).rename('total_amount').to_frame()
-)
-
-late_counts = (
-    dfar[dfar['diff'] > 0].groupby('ชื่อ')['diff'].count().rename('late_freq')
-)
-total_counts = (
-    dfar.groupby('ชื่อ')['diff'].count().rename('total_count')
-)
-
-late_pct = (
-    pd.concat([late_counts, total_counts], axis=1)
-    .assign(**{'% จ่ายเกินเวลา': lambda x: (x['late_freq'] / x['total_count']) * 100})
-    [['% จ่ายเกินเวลา']]
-    .round(0)
-    .fillna(0)
-)
-
-bins = [-0.1, 10, 30, 50, 70, 100]
-grades = ['ต่ำมาก', 'ต่ำ', 'ปานกลาง', 'เสี่ยง', 'เสี่ยงสูง']
-
-late_pct['grade'] = pd.cut(late_pct['% จ่ายเกินเวลา'], bins=bins, labels=grades, right=True)
-late_pct['description'] = pd.cut(late_pct['% จ่ายเกินเวลา'], bins=bins, right=True)
-
-risk_table = late_pct.sort_values('% จ่ายเกินเวลา', ascending=False)[['% จ่ายเกินเวลา', 'grade']]
-
-st.title('วิเคราะห์พฤติกรรมลูกหนี้')
-col1, col2, col3 = st.columns(3)
-with col1:
-    st.subheader("เฉลี่ยระยะเวลา (วัน)")
-    st.dataframe(avg_duration, use_container_width=True)
-with col2:
-    st.subheader("ยอดเงินรวม (฿)")
-    st.dataframe(total_amount, use_container_width=True)
-with col3:
-    st.subheader("% จ่ายเกินเวลา & ความเสี่ยง")
-    st.dataframe(risk_table, use_container_width=True)
-
-dfap = df_filtered[df_filtered['ประเภท'] == 'เจ้าหนี้']
-
-avg_durationap = (
-    dfap.groupby('ชื่อ')['ระยะเวลาที่กำหนด'].mean()
-    .sort_values(ascending=True).head(10)
-    .rename('ระยะเวลาเฉลี่ย (น้อยสุด 10 อันดับ)').to_frame().round(0)
-)
-
-total_amountap = (
-    dfap.groupby('ชื่อ')['จำนวนเงิน'].sum()
-    .sort_values(ascending=True).head(10)
-    .rename('ยอดเงินรวม (น้อยสุด 10 อันดับ)').to_frame().round(0)
-)
-
-st.title('วิเคราะห์พฤติกรรมเจ้าหนี้')
-col1, col2 = st.columns(2)
-with col1:
-    st.subheader("ระยะเวลาเฉลี่ย 10 อันดับที่น้อยสุด")
-    st.dataframe(avg_durationap, use_container_width=True)
-with col2:
-    st.subheader("ยอดเงินรวม 10 อันดับที่มากสุด")
-    st.dataframe(total_amountap, use_container_width=True)
-
-st.title('เงินสดสะสมรายวัน')
-
-dfcashflow = pd.merge(df, late_pct, on='ชื่อ', how='left')
-dfcashflow['riskamt'] = (dfcashflow['% จ่ายเกินเวลา']/100) * dfcashflow['จำนวนเงิน']
-dfcashflow['cash_in']  = dfcashflow['จำนวนเงิน'].where(dfcashflow['จำนวนเงิน'] > 0, 0)
-dfcashflow['cash_out'] = dfcashflow['จำนวนเงิน'].where(dfcashflow['จำนวนเงิน'] < 0, 0)
-
-df_grouped = (
-    dfcashflow.groupby('วันที่จ่ายจริง')
-    .agg({'cash_in': 'sum', 'cash_out': 'sum'})
-    .reset_index()
-)
-
-df_debtors = dfcashflow[dfcashflow['ประเภท'] == 'ลูกหนี้']
-df_daily_risk = (
-    df_debtors.groupby('วันที่จ่ายจริง')
-    .agg({'riskamt': 'sum', 'จำนวนเงิน': 'sum'})
-    .rename(columns={'riskamt': 'total_riskamt', 'จำนวนเงิน': 'total_amount'})
-    .reset_index()
-)
-df_daily_risk['risk_ratio'] = df_daily_risk['total_riskamt'] / df_daily_risk['total_amount']
-df_daily_risk['risk_pct']   = (df_daily_risk['risk_ratio'] * 100).round(2)
-
-df_grouped = pd.merge(
-    df_grouped, df_daily_risk, on='วันที่จ่ายจริง', how='left'
-).fillna({'total_riskamt': 0, 'total_amount': 0, 'risk_ratio': 0, 'risk_pct': 0})
-
-start_date2 = df_grouped['วันที่จ่ายจริง'].min()
-end_date2   = df_grouped['วันที่จ่ายจริง'].max()
-date_range  = pd.date_range(start=start_date2, end=end_date2, freq='D')
-df_dates    = pd.DataFrame({'วันที่': date_range})
-
-df_grouped.rename(columns={'วันที่จ่ายจริง': 'วันที่'}, inplace=True)
-df_merged = df_dates.merge(df_grouped, on='วันที่', how='left').fillna(0)
-
-df_merged['net_cash'] = df_merged['cash_in'] + df_merged['cash_out']
-
-cash_accum = st.number_input('กรุณาใส่ค่าเงินสดยกมา:', value=0.0, step=10000.0, format="%.0f")
-
-df_merged['เงินสดสะสม'] = df_merged['net_cash'].cumsum() + cash_accum
-df_merged['วันที่'] = pd.to_datetime(df_merged['วันที่'])
-df_merged = df_merged.set_index('วันที่')
-
-df_merged = df_merged.rename(columns={
-    'cash_in': 'กระแสเงินสดรับ',
-    'cash_out': 'กระแสเงินสดจ่าย',
-    'net_cash': 'กระแสเงินสดสุทธิ'
-})
-
-today = end_date
-df_merged['สะสมจริง'] = df_merged['เงินสดสะสม'].where(df_merged.index <= today)
-df_merged['สะสมคาดการณ์'] = df_merged['เงินสดสะสม'].where(df_merged.index > today)
-
-st.subheader("กราฟเงินสดสะสมเทียบ Risk %")
-rmin, rmax = st.slider("ช่วงแกนขวา Risk %", 0, 100, (70, 100), step=1)
-
-fig = go.Figure()
-fig.add_trace(go.Bar(x=df_merged.index, y=df_merged['risk_pct'], name='Risk %', yaxis='y2', opacity=0.4))
-fig.add_trace(go.Scatter(x=df_merged.index, y=df_merged['สะสมจริง'], mode='lines', name='สะสมจริง'))
-fig.add_trace(go.Scatter(x=df_merged.index, y=df_merged['สะสมคาดการณ์'], mode='lines', name='สะสมคาดการณ์'))
-
-fig.update_layout(
-    title='Cashflow Cumulative vs. Risk %',
-    xaxis=dict(title='Date', showgrid=False, zeroline=False),
-    yaxis=dict(title='Cumulative Cash', showgrid=False, zeroline=False),
-    yaxis2=dict(title='Risk %', overlaying='y', side='right', range=[rmin, rmax], showgrid=False, zeroline=False),
-    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-)
-st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
-
-df_from_today = df_merged.loc[df_merged.index >= today, [
-    'กระแสเงินสดรับ', 'กระแสเงินสดจ่าย', 'กระแสเงินสดสุทธิ', 'เงินสดสะสม', 'risk_pct'
-]]
-st.subheader('สรุปกระแสเงินสดรายวัน (ตั้งแต่วันนี้)')
-st.dataframe(df_from_today, use_container_width=True)
-
-st.title('วางแผนการจ่าย')
-
-threshold = st.number_input('กรุณาใส่ค่า threshold (จำนวนเงินขั้นต่ำ):', min_value=0.0, value=0.0, step=100_000.0, format="%.0f")
-
-df_merged = df_merged.loc[df_merged.index >= today].copy()
-cash_accum_today = df_merged['เงินสดสะสม'].iloc[0]
-
-df_cashout = (
-    df.loc[(pd.to_datetime(df['วันที่จะได้รับ/จ่าย']) >= today) & (df['จำนวนเงิน'] < 0)]
-    [['วันที่จะได้รับ/จ่าย', 'ชื่อ', 'จำนวนเงิน']].copy()
-)
-df_cashout.columns = ['วันที่', 'ชื่อเจ้าหนี้', 'จำนวนเงิน']
-df_cashout['วันที่'] = pd.to_datetime(df_cashout['วันที่'])
-
-df_cashout = (
-    df_cashout.merge(df_merged[['เงินสดสะสม']], left_on='วันที่', right_index=True, how='left')
-    .sort_values('วันที่')
-)
-
-payment_plan = []
-for _, row in df_cashout.iterrows():
-    orig_date = row['วันที่']
-    creditor  = row['ชื่อเจ้าหนี้']
-    amount    = row['จำนวนเงิน']
-    cash      = row['เงินสดสะสม']
-
-    if cash < threshold:
-        try:
-            pos = df_merged.index.get_loc(orig_date)
-        except KeyError:
-            continue
-        j = pos + 1
-        while j < len(df_merged) and df_merged.iloc[j]['เงินสดสะสม'] < threshold:
-            j += 1
-        if j < len(df_merged):
-            new_date = df_merged.index[j]
-            payment_plan.append({
-                'ชื่อเจ้าหนี้': creditor,
-                'วันที่เดิม': orig_date,
-                'วันที่จ่ายใหม่': new_date,
-                'จำนวนเงินที่เลื่อน': amount
-            })
-
-df_payment_plan = pd.DataFrame(payment_plan)
-
-st.subheader('สรุปแผนเลื่อนชำระ (ตั้งแต่วันนี้)')
-st.dataframe(df_payment_plan, use_container_width=True)
-
-df_adjusted = df_merged[['กระแสเงินสดสุทธิ']].copy()
-for _, row in df_payment_plan.iterrows():
-    orig = row['วันที่เดิม']
-    new  = row['วันที่จ่ายใหม่']
-    amt  = row['จำนวนเงินที่เลื่อน']
-    if orig in df_adjusted.index:
-        df_adjusted.loc[orig, 'กระแสเงินสดสุทธิ'] -= amt
-    if new in df_adjusted.index:
-        df_adjusted.loc[new, 'กระแสเงินสดสุทธิ']  += amt
-
-delta = df_adjusted['กระแสเงินสดสุทธิ'] - df_merged['กระแสเงินสดสุทธิ']
-df_adjusted['เงินสดสะสม_adjusted'] = df_merged['เงินสดสะสม'] + delta.cumsum()
-
-st.subheader('เปรียบเทียบเงินสดสะสม ก่อน–หลังเลื่อนชำระ (เริ่มตั้งแต่วันนี้)')
-df_compare = pd.DataFrame({'ก่อนเลื่อน': df_merged['เงินสดสะสม'], 'หลังเลื่อน': df_adjusted['เงินสดสะสม_adjusted']})
-st.line_chart(df_compare, use_container_width=True)
-
+import io
+import os
+
+import streamlit as st 
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+import aging
+import cache
+import charts
+import cube
+import diagnostics
+import engine
+import ledger_view
+import pipeline
+import scenarios
+import scheduler
+import store
+import trends
+
+
+st.set_page_config(page_title="CASHFLOW MANAGEMENT", layout="wide")
+
+
+col1, col2 = st.columns([9, 1])
+with col2:
+    st.image("logo.png", width=150)
+
+
+col1, col2, col3 = st.columns([1, 5, 1])
+with col2:
+    st.markdown("<h1 style='text-align: center; margin: 0;'>CASHFLOW MANAGEMENT</h1>", unsafe_allow_html=True)
+
+diag = diagnostics.Recorder(
+    enabled=diagnostics.enabled_by_env() or st.query_params.get('diagnostics') in ('1', 'true'),
+    log_path=os.environ.get(diagnostics.ENV_LOG),
+    # เก็บใน session state ให้ขั้นตอนที่รันใน fragment อยู่ในตารางของการรันทั้งหน้าครั้งถัดไป
+    records=st.session_state.setdefault('diagnostics', []),
+)
+
+@st.cache_resource(show_spinner=False)
+def ledger_cache():
+    return cache.FrameCache()
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def load_ledger(key, _data):
+    df = diag.run('cache_get', ledger_cache().get, key)
+    if df is not None:
+        return df
+
+    try:
+        df = diag.run('read_excel', engine.read_excel, io.BytesIO(_data))
+    except Exception:
+        raise OSError("ไม่สามารถเปิดไฟล์ได้")
+
+    missing = engine.missing_columns(df)
+    if missing:
+        raise engine.MissingColumnsError(missing)
+
+    try:
+        df = diag.run('prepare', engine.prepare, df)
+    except Exception:
+        raise ValueError("รูปแบบไม่ถูกต้อง")
+
+    diag.run('cache_put', ledger_cache().put, key, df)
+    return df
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def ledger_pipeline(key, _df):
+    return pipeline.SnapshotPipeline(_df)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def stored_ledger(name, key, today, _df):
+    ledger_store = store.open_store(name)
+    changes, stats = ledger_store.update(_df, today)
+    df = ledger_store.load()
+    return df, pipeline.StoredPipeline(df, stats), changes
+
+uploaded_file = st.file_uploader("Choose an Excel file", type=['xlsx'])
+if uploaded_file is None:
+    st.info("กรุณาอัปโหลดไฟล์ก่อน")
+    st.stop()
+
+data = uploaded_file.getvalue()
+key = cache.file_key(data)
+try:
+    df = diag.run('load', load_ledger, key, data)
+except Exception as e:
+    st.error(str(e))
+    st.stop()
+
+st.sidebar.subheader("ที่เก็บข้อมูล")
+use_store = st.sidebar.toggle("รวมกับข้อมูลเดิม (คำนวณเฉพาะส่วนที่เปลี่ยน)", value=False)
+store_name = st.sidebar.text_input("ชื่อที่เก็บ", value="default", disabled=not use_store)
+if use_store:
+    df, stages, changes = diag.run('store_update', stored_ledger, store_name, key, pd.Timestamp.today().normalize(), df)
+    first_date = changes['first_date']
+    st.sidebar.caption(
+        f"เพิ่ม {len(changes['added']):,} แถว · ลบ {len(changes['removed']):,} แถว · "
+        f"คู่ค้าที่เปลี่ยน {len(changes['names']):,} ราย"
+        + (f" · ตั้งแต่ {first_date:%Y-%m-%d}" if pd.notna(first_date) else "")
+    )
+else:
+    stages = ledger_pipeline(key, df)
+diag.context['file'] = key[:12]
+
+memory = stages.memory_report()
+st.sidebar.metric(
+    "หน่วยความจำข้อมูล", f"{memory['after_mb']:,.1f} MB",
+    delta=f"{memory['after_mb'] - memory['before_mb']:,.1f} MB จากแบบเดิม", delta_color="inverse"
+)
+
+@st.fragment
+def ledger_viewer(index):
+    with st.expander(f"ข้อมูลทั้งหมด ({index.n:,} แถว)", expanded=False):
+        col1, col2 = st.columns(2)
+        with col1:
+            names = st.multiselect("ชื่อ", index.options('ชื่อ'))
+        with col2:
+            types = st.multiselect("ประเภท", index.options('ประเภท'))
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            date_col = st.selectbox("กรองตามวันที่", engine.DATE_COLS)
+        with col2:
+            date_range = st.date_input("ช่วงวันที่", value=(), format="YYYY-MM-DD")
+        with col3:
+            amount_min = st.number_input("ยอดเงินตั้งแต่", value=None, format="%.0f")
+        with col4:
+            amount_max = st.number_input("ยอดเงินถึง", value=None, format="%.0f")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            sort = st.selectbox("เรียงตาม", ledger_view.SORTABLE)
+        with col2:
+            ascending = st.toggle("น้อยไปมาก", value=True)
+        with col3:
+            page_size = st.selectbox("แถวต่อหน้า", [50, 100, 500], index=1)
+
+        rows = index.rows(
+            sort, ascending, names=names, types=types, date_col=date_col,
+            date_range=tuple(date_range) if len(date_range) == 2 else None,
+            amount_range=None if amount_min is None and amount_max is None else (amount_min, amount_max),
+        )
+        pages = max(1, -(-len(rows) // page_size))
+        page = st.number_input(f"หน้า (จาก {pages:,})", min_value=1, max_value=pages, value=1, step=1)
+
+        st.dataframe(index.page(rows, page, page_size), use_container_width=True)
+        start = (page - 1) * page_size
+        st.caption(f"แสดง {min(start + 1, len(rows)):,}–{min(start + page_size, len(rows)):,} จาก {len(rows):,} แถว")
+
+ledger_viewer(stages.ledger_index())
+
+# วันที่แบ่งข้อมูลจริง/คาดการณ์ เลื่อนดูย้อนหลังได้ (สถิติ ณ วันนั้นมาจาก prefix sum ที่สร้างไว้ครั้งเดียว)
+current = pd.Timestamp.today().normalize()
+first_paid = df['วันที่จ่ายจริง'].min()
+first_paid = current if pd.isna(first_paid) else first_paid
+last_paid = max(df['วันที่จ่ายจริง'].max(), current) if df['วันที่จ่ายจริง'].notna().any() else current
+as_of = pd.Timestamp(st.sidebar.slider(
+    "ข้อมูล ณ วันที่", first_paid.date(), last_paid.date(), min(current, last_paid).date(), format="YYYY-MM-DD"
+)) if first_paid < last_paid else current
+
+st.title('AR & AP DAYS')
+
+start_date = df['วันที่จ่ายจริง'].min()
+end_date   = as_of
+
+days = diag.run('ar_ap_days', stages.ar_ap_days, end_date)
+
+col0, col1, col2 = st.columns(3)
+with col0:
+    st.metric("วันที่เริ่มต้นข้อมูล", start_date.strftime("%Y-%m-%d"))
+with col1:
+    st.metric("วันที่สิ้นสุด", end_date.strftime("%Y-%m-%d"))
+with col2:
+    st.metric("ระยะเวลาข้อมูลที่ใช้ในการคำนวณ", f"{(end_date - start_date).days} วัน")
+
+cols = st.columns(2)
+with cols[0]:
+    if days['ar_days'] is not None:
+        st.metric("AR DAYS", f"{days['ar_days']} วัน", delta=f"{days['ar_ontime']:+d} วัน(ช้า/เร็ว)", delta_color="inverse")
+with cols[1]:
+    if days['ap_days'] is not None:
+        st.metric("AP DAYS", f"{days['ap_days']} วัน", delta=f"{days['ap_ontime']:+d} วัน(ช้า/เร็ว)", delta_color="normal")
+
+@st.fragment
+def ar_ap_trend(stages, end_date):
+    with st.expander("แนวโน้ม AR / AP DAYS", expanded=False):
+        col1, col2, col3 = st.columns([1, 1, 2])
+        with col1:
+            period = st.radio("ช่วง", ["ย้อนหลัง 30/90/365 วัน", "รายเดือน"])
+        with col2:
+            metric = st.radio("ค่า", ["days", "ontime"], format_func={'days': "จำนวนวัน", 'ontime': "ช้า/เร็ว (วัน)"}.get)
+        with col3:
+            names = st.multiselect(f"แยกตามคู่ค้า (ไม่เกิน {trends.MAX_NAMES} ราย)", stages.ledger_index().options('ชื่อ'),
+                                   max_selections=trends.MAX_NAMES)
+
+        key = 'ชื่อ' if names else 'ประเภท'
+        if period == "รายเดือน":
+            trend = diag.run('monthly_days', stages.monthly_days, end_date, bool(names))
+            if names:
+                trend = trend[trend['ชื่อ'].isin(names)]
+        else:
+            trend = diag.run('rolling_days', stages.rolling_days, end_date, tuple(names) if names else None)
+        if trend.empty:
+            st.info("ไม่มีข้อมูล")
+            return
+        table = trends.trend_table(trend, key, metric)
+        st.plotly_chart(charts.trend_figure(table, 'AR / AP DAYS', 'Days'), use_container_width=True,
+                        config={"displayModeBar": False})
+
+ar_ap_trend(stages, end_date)
+
+avg_duration, total_amount, late_pct = diag.run('debtor_stats', stages.debtor_stats, end_date)
+risk_table = stages.risk_table(end_date)
+
+st.title('วิเคราะห์พฤติกรรมลูกหนี้')
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.subheader("เฉลี่ยระยะเวลา (วัน)")
+    st.dataframe(avg_duration, use_container_width=True)
+with col2:
+    st.subheader("ยอดเงินรวม (฿)")
+    st.dataframe(total_amount, use_container_width=True)
+with col3:
+    st.subheader("% จ่ายเกินเวลา & ความเสี่ยง")
+    st.dataframe(risk_table, use_container_width=True)
+
+avg_durationap, total_amountap = diag.run('creditor_stats', stages.creditor_stats, end_date)
+
+st.title('วิเคราะห์พฤติกรรมเจ้าหนี้')
+col1, col2 = st.columns(2)
+with col1:
+    st.subheader("ระยะเวลาเฉลี่ย 10 อันดับที่น้อยสุด")
+    st.dataframe(avg_durationap, use_container_width=True)
+with col2:
+    st.subheader("ยอดเงินรวม 10 อันดับที่มากสุด")
+    st.dataframe(total_amountap, use_container_width=True)
+
+st.title('อายุหนี้ค้างรับ / ค้างจ่าย')
+
+@st.fragment
+def aging_report(stages, end_date):
+    table = diag.run('aging_table', stages.aging_table, end_date)
+    if table.empty:
+        st.info("ไม่มีรายการค้าง ณ วันที่เลือก")
+        return
+    st.subheader(f"ยอดรวมตามจำนวนวันที่เลยกำหนด ณ {end_date:%Y-%m-%d}")
+    st.dataframe(aging.totals(table), use_container_width=True)
+    side = st.radio("ประเภท", list(aging.SIDES), horizontal=True)
+    if side in table.index.get_level_values('ประเภท'):
+        st.dataframe(table.xs(side, level='ประเภท').sort_values('รวม', key=abs, ascending=False), use_container_width=True)
+
+aging_report(stages, end_date)
+
+st.title('เงินสดสะสมรายวัน')
+
+cash_accum = st.number_input('กรุณาใส่ค่าเงินสดยกมา:', value=0.0, step=10000.0, format="%.0f")
+
+today = end_date
+df_merged = diag.run('daily_cashflow', stages.daily_cashflow, today, cash_accum)
+
+@st.fragment
+def risk_chart(df_merged):
+    st.subheader("กราฟเงินสดสะสมเทียบ Risk %")
+    rmin, rmax = st.slider("ช่วงแกนขวา Risk %", 0, 100, (70, 100), step=1)
+
+    first, last = df_merged.index[0].date(), df_merged.index[-1].date()
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        # ซูมฝั่ง server: เลือกช่วงแล้วย่อข้อมูล/รวมแท่งใหม่เฉพาะช่วงนั้น
+        window = st.slider("ช่วงวันที่", first, last, (first, last), format="YYYY-MM-DD") if first < last else (first, last)
+    with col2:
+        fast = st.toggle("โหมดเร็ว (WebGL)", value=len(df_merged) > charts.POINT_BUDGET)
+
+    visible = df_merged.loc[pd.Timestamp(window[0]):pd.Timestamp(window[1])]
+    fig = charts.cash_risk_figure(visible, rmin, rmax, fast=fast)
+    diag.run('plotly_chart', st.plotly_chart, fig, use_container_width=True, config={"displayModeBar": False})
+
+risk_chart(df_merged)
+
+df_from_today = stages.from_today(today, cash_accum)
+
+@st.fragment
+def cash_summary(stages, today, cash_accum, df_from_today):
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        default = {'D': 0, 'W': 1, 'MS': 2}[charts.bar_freq(df_from_today)]
+        granularity = st.radio("งวด", list(cube.GRANULARITIES), index=default, format_func=cube.GRANULARITIES.get)
+    with col2:
+        split = st.radio("แยกตาม", ["ไม่แยก", "ประเภท", "คู่ค้า"])
+    with col3:
+        names = st.multiselect(f"คู่ค้า (ไม่เกิน {cube.MAX_NAMES} ราย)", stages.ledger_index().options('ชื่อ'),
+                               max_selections=cube.MAX_NAMES, disabled=split != "คู่ค้า")
+
+    by = {'ไม่แยก': None, 'ประเภท': 'ประเภท', 'คู่ค้า': 'ชื่อ'}[split]
+    if by == 'ชื่อ' and not names:
+        st.info("เลือกคู่ค้าอย่างน้อยหนึ่งราย")
+        return
+    table = diag.run('cash_rollup', stages.cash_rollup, today, cash_accum, granularity, by,
+                     tuple(names) if by == 'ชื่อ' else None)
+
+    st.subheader(f'สรุปกระแสเงินสด{cube.GRANULARITIES[granularity]} (ตั้งแต่วันนี้)')
+    st.plotly_chart(charts.cube_figure(table, by), use_container_width=True, config={"displayModeBar": False})
+    st.dataframe(table, use_container_width=True)
+
+cash_summary(stages, today, cash_accum, df_from_today)
+
+st.title('วางแผนการจ่าย')
+
+@st.fragment
+def payment_planner(stages, today, cash_accum):
+    threshold = st.number_input('กรุณาใส่ค่า threshold (จำนวนเงินขั้นต่ำ):', min_value=0.0, value=0.0, step=100_000.0, format="%.0f")
+
+    plan_modes = {
+        'ตามเงินสดสะสมเดิม': 'static',
+        'คิดยอดที่เลื่อนแล้ว (ไม่ต่ำกว่า threshold อีกจนจบช่วง)': 'balanced',
+        'คิวตามวันครบกำหนด (เร็ว)': 'greedy',
+    }
+    if scheduler.milp_available():
+        plan_modes['MILP (ถ่วงน้ำหนักเจ้าหนี้สำคัญ)'] = 'milp'
+    plan_mode = st.radio('วิธีวางแผน', list(plan_modes), horizontal=True)
+    mode = plan_modes[plan_mode]
+
+    priority = ()
+    if mode in scheduler.MODES:
+        priority = tuple(st.multiselect('เจ้าหนี้สำคัญ (เลื่อนเป็นลำดับสุดท้าย)', stages.ledger_index().options('ชื่อ')))
+
+    df_payment_plan = diag.run('plan_deferrals', stages.plan_deferrals, today, cash_accum, threshold, mode, priority)
+
+    if 'solver' in df_payment_plan.attrs:
+        st.warning(df_payment_plan.attrs['solver'])
+    st.subheader('สรุปแผนเลื่อนชำระ (ตั้งแต่วันนี้)')
+    st.dataframe(df_payment_plan, use_container_width=True)
+
+    st.subheader('เปรียบเทียบเงินสดสะสม ก่อน–หลังเลื่อนชำระ (เริ่มตั้งแต่วันนี้)')
+    df_compare = diag.run('apply_deferrals', stages.apply_deferrals, today, cash_accum, threshold, mode, priority)
+    df_shortfalls = diag.run('shortfalls', stages.shortfalls, today, cash_accum, threshold)
+    st.plotly_chart(charts.shortfall_figure(df_compare, df_shortfalls, threshold), use_container_width=True,
+                    config={"displayModeBar": False})
+
+    st.subheader(f'ช่วงที่เงินสดสะสมต่ำกว่า threshold ก่อนเลื่อนชำระ ({len(df_shortfalls)} ช่วง)')
+    st.dataframe(df_shortfalls, use_container_width=True, hide_index=True)
+
+payment_planner(stages, today, cash_accum)
+
+@st.fragment
+def scenario_grid(stages, today, cash_accum, future):
+    with st.expander("เปรียบเทียบหลาย threshold × เงินสดยกมา", expanded=False):
+        low = float(future.min()) if len(future) else 0.0
+        high = float(future.max()) if len(future) else 0.0
+        col1, col2, col3, col4, col5 = st.columns(5)
+        with col1:
+            t_min = st.number_input('threshold ตั้งแต่', value=max(low, 0.0), step=100_000.0, format="%.0f")
+        with col2:
+            t_max = st.number_input('threshold ถึง', value=max(high, 0.0), step=100_000.0, format="%.0f")
+        with col3:
+            b_min = st.number_input('เงินสดยกมาตั้งแต่', value=cash_accum - abs(cash_accum) / 2, step=100_000.0, format="%.0f")
+        with col4:
+            b_max = st.number_input('เงินสดยกมาถึง', value=cash_accum + abs(cash_accum) / 2, step=100_000.0, format="%.0f")
+        with col5:
+            steps = st.slider('จำนวนค่าต่อแกน', 2, 50, 20)
+        metric = st.selectbox('แสดง', list(scenarios.METRICS), format_func=scenarios.METRICS.get)
+
+        thresholds = tuple(np.linspace(t_min, t_max, steps))
+        balances = tuple(np.linspace(b_min, b_max, steps))
+        grid = diag.run('scenario_grid', stages.scenario_grid, today, thresholds, balances)
+        table = scenarios.heatmap_table(grid, metric)
+        st.plotly_chart(charts.scenario_heatmap(table, scenarios.METRICS[metric]), use_container_width=True,
+                        config={"displayModeBar": False})
+
+scenario_grid(stages, today, cash_accum, df_from_today['เงินสดสะสม'])
+
+st.title('จำลองเงินสดสะสม (Monte Carlo)')
+
+@st.fragment
+def cash_simulation(stages, today, cash_accum):
+    st.caption("สุ่มวันรับของลูกหนี้ที่ยังไม่ได้รับ ตามประวัติจ่ายช้า/เร็ว (diff) ของแต่ละราย")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        threshold = st.number_input('threshold ของการจำลอง:', min_value=0.0, value=0.0, step=100_000.0, format="%.0f")
+    with col2:
+        paths = st.selectbox('จำนวนรอบ', [10_000, 50_000, 100_000])
+    with col3:
+        horizon = st.slider('จำนวนวันข้างหน้า', 30, 730, 365, step=30)
+
+    if not st.toggle("เริ่มจำลอง", value=False):
+        return
+    bands = diag.run('simulation', stages.simulation, today, cash_accum, threshold, paths, horizon)
+    if bands.empty:
+        st.info("ไม่มีข้อมูลตั้งแต่วันนี้")
+        return
+    st.plotly_chart(charts.simulation_figure(bands, threshold), use_container_width=True, config={"displayModeBar": False})
+    st.dataframe(bands, use_container_width=True)
+
+cash_simulation(stages, today, cash_accum)
+
+if diag.enabled:
+    with st.sidebar.expander("Diagnostics", expanded=False):
+        st.caption("ขั้นตอนที่รันใหม่ใน fragment จะแสดงเมื่อรันทั้งหน้าครั้งถัดไป ; peak_rss_mb คือ RSS สูงสุดระหว่างขั้นตอน")
+        st.dataframe(diag.table().iloc[::-1], use_container_width=True, hide_index=True)
@@ -0,0 +1,45 @@
+import numpy as np
+
+import engine
+import scenarios
+import synth
+
+
+def _flows():
+    df = engine.prepare(synth.generate(2_000, seed=0))
+    today = synth.as_of()
+    late_pct = engine.debtor_stats(engine.filter_actual(df, today))[2]
+    return df, engine.daily_flows(df, late_pct), today
+
+
+def test_grid_degenerate_axes_pivot():
+    # ค่าเริ่มต้นของแอป: เงินสดยกมา 0 และ threshold ช่วงเดียว linspace จึงได้ค่าซ้ำทั้งแกน
+    df, df_flows, today = _flows()
+    grid = scenarios.grid(df, df_flows, today, np.linspace(0.0, 0.0, 20), np.linspace(0.0, 0.0, 20))
+    assert len(grid) == 1
+    for metric in scenarios.METRICS:
+        table = scenarios.heatmap_table(grid, metric)
+        assert table.shape == (1, 1)
+
+
+def test_grid_one_degenerate_axis():
+    df, df_flows, today = _flows()
+    thresholds = np.linspace(0.0, 1e6, 5)
+    grid = scenarios.grid(df, df_flows, today, thresholds, np.linspace(5e6, 5e6, 20))
+    table = scenarios.heatmap_table(grid, 'days_below')
+    assert table.shape == (1, 5)
+    assert list(table.columns) == list(thresholds)
+
+
+def test_grid_matches_static_plan():
+    df, df_flows, today = _flows()
+    future = df_flows.loc[df_flows.index >= today, 'net_cumsum']
+    thresholds = np.quantile(future, [0.2, 0.5, 0.8])
+    grid = scenarios.grid(df, df_flows, today, thresholds, [0.0, 1e5])
+    for row in grid.itertuples(index=False):
+        df_merged = engine.cumulative(df_flows, row.cash_accum, today)
+        plan = engine.plan_deferrals(df, df_merged, row.threshold, today)
+        after = engine.apply_deferrals(df_merged, plan, today)['หลังเลื่อน']
+        assert row.deferred_count == len(plan)
+        assert np.isclose(row.min_balance, after.min())
+        assert row.days_below == (after < row.threshold).sum()
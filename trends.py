@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+
+WINDOWS = (30, 90, 365)
+SIDES = {'ลูกหนี้': 'AR', 'เจ้าหนี้': 'AP'}
+# จำนวนคู่ค้าสูงสุดที่แยกเป็นเส้นรายวันได้ (ตาราง คู่ค้า × วัน อยู่ในหน่วยความจำ)
+MAX_NAMES = 200
+
+
+def _groups(df, names):
+    """รหัสกลุ่มต่อแถวและชื่อกลุ่ม: ต่อประเภท (AR/AP) หรือต่อคู่ค้าที่เลือก"""
+    if names is None:
+        labels = pd.Index(list(SIDES.values()), name='ประเภท')
+        codes = pd.Index(list(SIDES)).get_indexer(df['ประเภท'])
+    else:
+        labels = pd.Index(list(names), name='ชื่อ')
+        codes = labels.get_indexer(df['ชื่อ'].astype(object))
+    return codes, labels
+
+
+def rolling_days(df_filtered, windows=WINDOWS, names=None):
+    """AR/AP DAYS (เฉลี่ย ระยะเวลา) และค่าเฉลี่ยช้า/เร็ว (diff) ย้อนหลัง windows วัน ณ ทุกวัน
+
+    ยอดต่อวันลงตาราง กลุ่ม × วัน ด้วย bincount ครั้งเดียว แล้วยอดของทุกหน้าต่างคือผลต่างของ cumsum
+    names=None แยกตามประเภท, ระบุ names (ไม่เกิน MAX_NAMES) เพื่อแยกตามคู่ค้า (รวมทุกประเภทของรายนั้น)
+    คืนตารางยาว: index = วันที่, คอลัมน์ ประเภท/ชื่อ, window, days, ontime, count
+    """
+    if names is not None and len(names) > MAX_NAMES:
+        raise ValueError(f"เลือกคู่ค้าได้ไม่เกิน {MAX_NAMES} ราย")
+
+    df = df_filtered[df_filtered['วันที่จ่ายจริง'].notna()]
+    codes, labels = _groups(df, names)
+    df, codes = df[codes >= 0], codes[codes >= 0]
+    key = labels.name
+    if df.empty:
+        return pd.DataFrame(columns=[key, 'window', 'days', 'ontime', 'count'])
+
+    paid = df['วันที่จ่ายจริง'].to_numpy().astype('datetime64[D]')
+    first = paid.min()
+    n_days = int((paid.max() - first).astype(int)) + 1
+    cell = codes * n_days + (paid - first).astype(int)
+
+    def grid(values):
+        sums = np.bincount(cell, weights=values, minlength=len(labels) * n_days)
+        # คอลัมน์แรกเป็นศูนย์ ให้ cum[:, t + 1] - cum[:, t + 1 - w] คือยอดของ w วันที่ลงท้ายที่วัน t
+        return np.pad(sums.reshape(len(labels), n_days).cumsum(axis=1), ((0, 0), (1, 0)))
+
+    duration, diff = df['ระยะเวลา'].to_numpy(dtype=float), df['diff'].to_numpy(dtype=float)
+    cum = {
+        'dur_sum': grid(np.nan_to_num(duration)), 'dur_n': grid(~np.isnan(duration)),
+        'diff_sum': grid(np.nan_to_num(diff)), 'diff_n': grid(~np.isnan(diff)),
+        'count': grid(np.ones(len(df))),
+    }
+    dates = pd.date_range(pd.Timestamp(first), periods=n_days, freq='D', name='วันที่')
+    end = np.arange(1, n_days + 1)
+
+    frames = []
+    for w in windows:
+        start = np.maximum(end - w, 0)
+        window = {name: c[:, end] - c[:, start] for name, c in cum.items()}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            days = window['dur_sum'] / np.where(window['dur_n'] > 0, window['dur_n'], np.nan)
+            ontime = window['diff_sum'] / np.where(window['diff_n'] > 0, window['diff_n'], np.nan)
+        frames.append(pd.DataFrame({
+            key: np.repeat(labels.to_numpy(), n_days),
+            'window': f'{w}D',
+            'days': days.ravel(),
+            'ontime': ontime.ravel(),
+            'count': window['count'].ravel().astype(np.int64),
+        }, index=np.tile(dates, len(labels))))
+    result = pd.concat(frames)
+    result.index.name = 'วันที่'
+    return result
+
+
+def monthly_days(df_filtered, by_name=False):
+    """AR/AP DAYS และค่าเฉลี่ยช้า/เร็วรายเดือน (ตามเดือนของวันที่จ่ายจริง) ต่อประเภท หรือต่อคู่ค้าทุกราย"""
+    df = df_filtered[df_filtered['วันที่จ่ายจริง'].notna()]
+    key = df['ชื่อ'] if by_name else df['ประเภท'].map(SIDES).rename('ประเภท')
+    month = pd.Series(
+        df['วันที่จ่ายจริง'].to_numpy().astype('datetime64[M]').astype('datetime64[ns]'), index=df.index, name='เดือน'
+    )
+    return (
+        df[['ระยะเวลา', 'diff']]
+        .groupby([month, key.astype(object)], observed=True)
+        .agg(days=('ระยะเวลา', 'mean'), ontime=('diff', 'mean'), count=('diff', 'size'))
+        .reset_index(level=1)
+    )
+
+
+def trend_table(trend, key, metric='days'):
+    """ตารางกว้างสำหรับกราฟเส้นจาก rolling_days() / monthly_days(): คอลัมน์ = '<กลุ่ม> <window>'"""
+    labels = trend[key].astype(str)
+    if 'window' in trend.columns:
+        labels = labels + ' ' + trend['window']
+    return trend.assign(series=labels.to_numpy()).pivot(columns='series', values=metric)
+